@@ -0,0 +1,136 @@
+"""
+Лента пользователя /me/activity: его резервы и взносы по всем вишлистам.
+
+Страница — один SQL-запрос. Резервы и взносы пользователя читаются
+каждый своим диапазоном индекса (user_id, created_at, id) с LIMIT,
+склеиваются через UNION ALL, и только отобранные строки присоединяются
+к подаркам и вишлистам. Стоимость страницы не зависит от того, в скольких
+вишлистах участвует пользователь и сколько там подарков.
+
+Порядок — новые сверху по ключу (created_at, kind, id); курсор
+следующей страницы — этот ключ последней записи (см. pagination.py).
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import BigInteger, and_, cast, func, literal, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Contribution, Reservation, Wishlist, WishlistItem
+from .money import from_cents
+from .rendering import item_public
+from .schemas import ActivityEntry, WishlistSummary
+
+KIND_CONTRIBUTION = "contribution"
+KIND_RESERVATION = "reservation"
+
+# (created_at, kind, id) последней отданной записи
+ActivityKey = Tuple[datetime, str, int]
+
+
+def _entries(model, kind: str, amount, user_id: int, after: Optional[ActivityKey], limit: int):
+    """
+    Записи одного вида строго после ключа after. kind у всей ветки один,
+    поэтому сравнение тройки сводится к условию по (created_at, id),
+    которое читается диапазоном индекса.
+    """
+    stmt = select(
+        literal(kind).label("kind"),
+        model.id.label("entry_id"),
+        model.created_at.label("created_at"),
+        model.item_id.label("item_id"),
+        amount.label("amount_cents"),
+    ).where(model.user_id == user_id)
+    if after is not None:
+        created_at, after_kind, after_id = after
+        if kind < after_kind:
+            stmt = stmt.where(model.created_at <= created_at)
+        elif kind > after_kind:
+            stmt = stmt.where(model.created_at < created_at)
+        else:
+            stmt = stmt.where(
+                or_(
+                    model.created_at < created_at,
+                    and_(model.created_at == created_at, model.id < after_id),
+                )
+            )
+    return select(
+        stmt.order_by(model.created_at.desc(), model.id.desc()).limit(limit).subquery()
+    )
+
+
+def build_activity_query(user_id: int, *, after: Optional[ActivityKey] = None, limit: int):
+    """SELECT страницы ленты: не больше limit записей после ключа after."""
+    entries = union_all(
+        _entries(
+            Contribution, KIND_CONTRIBUTION, Contribution.amount_cents, user_id, after, limit
+        ),
+        _entries(
+            Reservation, KIND_RESERVATION, literal(None, BigInteger), user_id, after, limit
+        ),
+    ).subquery("entries")
+
+    # взносы пользователя в подарок — по индексу (item_id, user_id)
+    your_contribution = (
+        select(cast(func.coalesce(func.sum(Contribution.amount_cents), 0), BigInteger))
+        .where(Contribution.item_id == WishlistItem.id, Contribution.user_id == user_id)
+        .scalar_subquery()
+    )
+
+    return (
+        select(
+            entries.c.kind,
+            entries.c.entry_id,
+            entries.c.created_at,
+            entries.c.amount_cents,
+            WishlistItem.id,
+            WishlistItem.name,
+            WishlistItem.url,
+            WishlistItem.price_cents,
+            WishlistItem.image_url,
+            WishlistItem.total_contributed_cents,
+            WishlistItem.reserved_by_id,
+            your_contribution.label("your_contribution_cents"),
+            Wishlist.id.label("wishlist_id"),
+            Wishlist.public_id,
+            Wishlist.title,
+            Wishlist.description,
+            Wishlist.event_date,
+            Wishlist.created_at.label("wishlist_created_at"),
+        )
+        .select_from(entries)
+        .join(WishlistItem, WishlistItem.id == entries.c.item_id)
+        .join(Wishlist, Wishlist.id == WishlistItem.wishlist_id)
+        .order_by(entries.c.created_at.desc(), entries.c.kind.desc(), entries.c.entry_id.desc())
+        .limit(limit)
+    )
+
+
+async def load_activity(
+    db: AsyncSession, user_id: int, *, after: Optional[ActivityKey] = None, limit: int
+) -> List[ActivityEntry]:
+    rows = (await db.execute(build_activity_query(user_id, after=after, limit=limit))).all()
+    return [
+        ActivityEntry.construct(
+            kind=row.kind,
+            id=row.entry_id,
+            created_at=row.created_at,
+            amount_cents=row.amount_cents,
+            amount=None if row.amount_cents is None else from_cents(row.amount_cents),
+            item=item_public(
+                row,
+                viewer_id=user_id,
+                your_contribution_cents=row.your_contribution_cents,
+            ),
+            wishlist=WishlistSummary.construct(
+                id=row.wishlist_id,
+                public_id=row.public_id,
+                title=row.title,
+                description=row.description,
+                event_date=row.event_date,
+                created_at=row.wishlist_created_at,
+            ),
+        )
+        for row in rows
+    ]
@@ -0,0 +1,102 @@
+"""
+Пересчёт денормализованных агрегатов подарков (total_contributed_cents,
+contributors_count, reserved_by_id) по таблицам contributions и reservations.
+С --legacy-columns только добавляет колонки-счётчики в базу, созданную
+до них через create_all, — это нужно сделать перед `alembic stamp 0001`
+(см. migrations/versions/0001_initial_schema.py).
+
+Запуск:
+
+    python -m app.aggregates              # все подарки
+    python -m app.aggregates --item 1 2   # только указанные
+    python -m app.aggregates --legacy-columns
+"""
+
+import argparse
+from typing import Iterable, Optional
+
+from sqlalchemy import distinct, func, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal, get_engine
+from .models import Contribution, Reservation, WishlistItem
+
+# Колонки агрегатов в том виде, в каком они были в ревизии 0001:
+# дальше схему меняют миграции, а не этот скрипт.
+_AGGREGATE_COLUMNS = (
+    ("wishlist_items", "total_contributed", "NUMERIC(10, 2) NOT NULL DEFAULT 0"),
+    ("wishlist_items", "contributors_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("wishlist_items", "reserved_by_id", "INTEGER"),
+    ("wishlists", "event_seq", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+def ensure_aggregate_columns(bind: Engine) -> None:
+    """
+    Добавляет колонки агрегатов в таблицы, созданные create_all до них,
+    чтобы базу можно было пометить ревизией 0001.
+    """
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        for table, name, ddl in _AGGREGATE_COLUMNS:
+            if name in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def repair_item_aggregates(db: Session, item_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Пересчитывает агрегаты одним UPDATE с коррелированными подзапросами.
+    Возвращает число обновлённых подарков.
+    """
+    total = (
+        select(func.coalesce(func.sum(Contribution.amount_cents), 0))
+        .where(Contribution.item_id == WishlistItem.id)
+        .scalar_subquery()
+    )
+    contributors = (
+        select(func.count(distinct(Contribution.user_id)))
+        .where(Contribution.item_id == WishlistItem.id)
+        .scalar_subquery()
+    )
+    reserved_by = (
+        select(Reservation.user_id)
+        .where(Reservation.item_id == WishlistItem.id)
+        .scalar_subquery()
+    )
+    stmt = update(WishlistItem).values(
+        total_contributed_cents=total,
+        contributors_count=contributors,
+        reserved_by_id=reserved_by,
+    )
+    if item_ids is not None:
+        stmt = stmt.where(WishlistItem.id.in_(list(item_ids)))
+    result = db.execute(stmt.execution_options(synchronize_session=False))
+    db.commit()
+    return result.rowcount
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Пересчёт агрегатов подарков")
+    parser.add_argument("--item", type=int, nargs="+", help="id подарков для пересчёта")
+    parser.add_argument(
+        "--legacy-columns",
+        action="store_true",
+        help="добавить колонки агрегатов в базу до миграций и выйти",
+    )
+    args = parser.parse_args(argv)
+
+    # движки ленивые (database.init_engines): без этого SessionLocal не привязан
+    engine = get_engine()
+    if args.legacy_columns:
+        ensure_aggregate_columns(engine)
+        print("Колонки агрегатов на месте, теперь: alembic stamp 0001")
+        return
+    with SessionLocal() as db:
+        updated = repair_item_aggregates(db, args.item)
+    print(f"Пересчитано подарков: {updated}")
+
+
+if __name__ == "__main__":
+    main()
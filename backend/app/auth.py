@@ -1,29 +1,48 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Response, status
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .config import settings
-from .database import get_db
+from .database import get_async_db
+from .hashing import HashingBusy, password_hasher
+from .limits import LOGIN, REGISTER, limit_by_ip
 from .models import User
+from .principals import invalidate_token
 from .schemas import Token, UserCreate, UserOut
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 AUTH_COOKIE_NAME = "access_token"
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервис перегружен, попробуйте позже",
+        headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+    )
 
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    (пароль верный, новый хэш или None). Новый хэш возвращается, если
+    сохранённый посчитан с устаревшими параметрами.
+    """
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except HashingBusy:
+        raise _busy()
+
+
+async def get_password_hash(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except HashingBusy:
+        raise _busy()
 
 
 def create_access_token(*, data: dict, expires_minutes: Optional[int] = None) -> str:
@@ -48,32 +67,49 @@ def decode_access_token(token: str) -> Optional[dict]:
         return None
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.email == email))
 
 
-@router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
-    existing = get_user_by_email(db, user_in.email)
+@router.post(
+    "/register",
+    response_model=UserOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[limit_by_ip(REGISTER)],
+)
+async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await get_user_by_email(db, user_in.email)
     if existing:
         raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")
 
     user = User(
         email=user_in.email,
         name=user_in.name,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await get_password_hash(user_in.password),
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
-@router.post("/login", response_model=Token)
-def login(response: Response, email: str, password: str, db: Session = Depends(get_db)):
-    user = get_user_by_email(db, email=email)
-    if not user or not verify_password(password, user.hashed_password):
+@router.post("/login", response_model=Token, dependencies=[limit_by_ip(LOGIN)])
+async def login(
+    response: Response,
+    email: str,
+    password: str,
+    db: AsyncSession = Depends(get_async_db),
+):
+    user = await get_user_by_email(db, email=email)
+    if not user:
+        raise HTTPException(status_code=400, detail="Неверный email или пароль")
+    valid, new_hash = await verify_password(password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=400, detail="Неверный email или пароль")
+    if new_hash:
+        # сменилась стоимость bcrypt: прозрачно пересохраняем хэш
+        user.hashed_password = new_hash
+        await db.commit()
 
     token = create_access_token(data={"sub": str(user.id)})
 
@@ -89,7 +125,12 @@ def login(response: Response, email: str, password: str, db: Session = Depends(g
 
 
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
-def logout(response: Response):
+def logout(
+    response: Response,
+    access_token: Optional[str] = Cookie(default=None, alias=AUTH_COOKIE_NAME),
+):
+    if access_token:
+        invalidate_token(access_token)
     response.delete_cookie(AUTH_COOKIE_NAME)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -0,0 +1,157 @@
+"""
+Pub/sub между инстансами приложения для realtime-рассылок.
+
+Каждый процесс подписывается только на каналы тех вишлистов, по которым
+у него сейчас есть открытые сокеты (см. WishlistConnectionManager).
+
+- InMemoryBroker — в пределах одного процесса;
+- PostgresBroker — LISTEN/NOTIFY в той же базе, что и приложение (asyncpg).
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Set
+
+from sqlalchemy.engine import make_url
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# (канал, данные) -> доставка локальным подписчикам
+DeliverCallback = Callable[[str, str], Awaitable[None]]
+
+
+class Broker:
+    """Интерфейс брокера."""
+
+    # Максимальный размер сообщения; None — без ограничения
+    max_payload: Optional[int] = None
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str) -> None:
+        raise NotImplementedError
+
+    async def unsubscribe(self, channel: str) -> None:
+        raise NotImplementedError
+
+    async def publish(self, channel: str, data: str) -> None:
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    def __init__(self) -> None:
+        self._deliver: Optional[DeliverCallback] = None
+        self._channels: Set[str] = set()
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+        self._channels.clear()
+
+    async def subscribe(self, channel: str) -> None:
+        self._channels.add(channel)
+
+    async def unsubscribe(self, channel: str) -> None:
+        self._channels.discard(channel)
+
+    async def publish(self, channel: str, data: str) -> None:
+        if self._deliver is not None and channel in self._channels:
+            await self._deliver(channel, data)
+
+
+class PostgresBroker(Broker):
+    """
+    LISTEN/NOTIFY на отдельном соединении asyncpg (вне пула SQLAlchemy:
+    LISTEN живёт, пока живо соединение). При обрыве соединение
+    переоткрывается и подписки восстанавливаются.
+    """
+
+    # NOTIFY принимает payload короче 8000 байт
+    max_payload = 7900
+
+    def __init__(self, dsn: str, *, reconnect_delay: float = 1.0) -> None:
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self._deliver: Optional[DeliverCallback] = None
+        self._channels: Set[str] = set()
+        self._conn = None
+        # asyncpg не выполняет запросы на одном соединении параллельно
+        self._lock = asyncio.Lock()
+        self._closing = False
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        self._deliver = deliver
+        self._closing = False
+        await self._connect()
+
+    async def stop(self) -> None:
+        self._closing = True
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def subscribe(self, channel: str) -> None:
+        self._channels.add(channel)
+        async with self._lock:
+            if self._conn is not None:
+                await self._conn.add_listener(channel, self._on_notify)
+
+    async def unsubscribe(self, channel: str) -> None:
+        self._channels.discard(channel)
+        async with self._lock:
+            if self._conn is not None:
+                await self._conn.remove_listener(channel, self._on_notify)
+
+    async def publish(self, channel: str, data: str) -> None:
+        async with self._lock:
+            if self._conn is None:
+                logger.warning("NOTIFY %s пропущен: нет соединения с Postgres", channel)
+                return
+            await self._conn.execute("SELECT pg_notify($1, $2)", channel, data)
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        async with self._lock:
+            self._conn = await asyncpg.connect(self.dsn)
+            self._conn.add_termination_listener(self._on_terminated)
+            for channel in self._channels:
+                await self._conn.add_listener(channel, self._on_notify)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        if self._deliver is not None:
+            asyncio.create_task(self._deliver(channel, payload))
+
+    def _on_terminated(self, connection) -> None:
+        self._conn = None
+        if not self._closing:
+            asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self._closing:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._connect()
+                return
+            except Exception:
+                logger.exception("Не удалось переподключиться к Postgres для LISTEN")
+
+
+def _postgres_dsn() -> str:
+    # asyncpg принимает обычный postgresql:// URL без указания драйвера
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+def make_broker() -> Broker:
+    if settings.REALTIME_BROKER == "postgres":
+        return PostgresBroker(_postgres_dsn())
+    return InMemoryBroker()
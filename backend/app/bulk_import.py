@@ -0,0 +1,140 @@
+"""
+Разбор и проверка строк массового импорта подарков.
+
+Принимаются три формата тела запроса (по Content-Type):
+- application/json     — массив объектов WishlistItemCreate или {"items": [...]};
+- application/x-ndjson — по объекту на строку;
+- text/csv             — заголовок name,url,price,image_url и строки данных.
+
+Каждая строка проверяется отдельно: ошибки копятся по номерам строк
+(с 1, без учёта заголовка CSV и пустых строк NDJSON), а не прерывают импорт.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Dict, List, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+
+from .schemas import BulkItemError, WishlistItemCreate
+
+CSV_FIELDS = ("name", "url", "price", "image_url")
+
+
+class _Unparsable:
+    __slots__ = ("line",)
+
+    def __init__(self, line: str) -> None:
+        self.line = line
+
+
+def _json_rows(text: str) -> List[Any]:
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный JSON")
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="Ожидается массив подарков")
+    return data
+
+
+def _ndjson_rows(text: str) -> List[Any]:
+    rows: List[Any] = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            # строку не разобрать — ошибка будет у неё, а не у всего импорта
+            rows.append(_Unparsable(line))
+    return rows
+
+
+def _csv_rows(text: str) -> List[Any]:
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or "name" not in reader.fieldnames:
+        raise HTTPException(
+            status_code=400, detail="В CSV нужен заголовок: " + ",".join(CSV_FIELDS)
+        )
+    # пустые ячейки — отсутствующие необязательные поля
+    return [
+        {k: v for k, v in row.items() if k in CSV_FIELDS and v not in (None, "")}
+        for row in reader
+    ]
+
+
+_PARSERS = {
+    "application/json": _json_rows,
+    "application/x-ndjson": _ndjson_rows,
+    "application/jsonl": _ndjson_rows,
+    "text/csv": _csv_rows,
+}
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """
+    Тело импорта не больше max_bytes, иначе 413: по Content-Length — до
+    чтения, без него (chunked) — как только прочитанное перевалило за лимит.
+    """
+    too_large = HTTPException(status_code=413, detail="Слишком большой файл импорта")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise too_large
+    chunks: List[bytes] = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def parse_items(
+    content_type: str, body: bytes, *, max_rows: int
+) -> Tuple[List[Tuple[int, WishlistItemCreate]], List[BulkItemError]]:
+    """
+    (валидные строки с их номерами, ошибки по строкам).
+    Неподдерживаемый формат — 415, слишком много строк — 413.
+    """
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    parser = _PARSERS.get(media_type)
+    if parser is None:
+        raise HTTPException(
+            status_code=415, detail="Поддерживаются JSON, NDJSON и CSV"
+        )
+    try:
+        # utf-8-sig: CSV из Excel начинается с BOM
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Ожидается текст в UTF-8")
+
+    rows = parser(text)
+    if len(rows) > max_rows:
+        raise HTTPException(
+            status_code=413, detail=f"Не больше {max_rows} подарков за один импорт"
+        )
+
+    valid: List[Tuple[int, WishlistItemCreate]] = []
+    errors: List[BulkItemError] = []
+    for number, raw in enumerate(rows, start=1):
+        if isinstance(raw, _Unparsable):
+            errors.append(BulkItemError(row=number, errors=["Некорректный JSON"]))
+            continue
+        if not isinstance(raw, dict):
+            errors.append(BulkItemError(row=number, errors=["Ожидается объект"]))
+            continue
+        try:
+            valid.append((number, WishlistItemCreate.parse_obj(raw)))
+        except ValidationError as exc:
+            errors.append(BulkItemError(row=number, errors=_messages(exc.errors())))
+    return valid, errors
+
+
+def _messages(errors: List[Dict[str, Any]]) -> List[str]:
+    return [".".join(str(p) for p in e["loc"]) + ": " + e["msg"] for e in errors]
@@ -0,0 +1,202 @@
+"""
+Кэш готовых JSON-снапшотов публичных вишлистов.
+
+Ключ снапшота — public_id, зритель и версия вишлиста. Любая запись
+в вишлист (add_item, reserve, contribute) увеличивает версию, поэтому
+старые снапшоты просто перестают находиться и вытесняются по LRU/TTL.
+Та же версия даёт строгий ETag: на If-None-Match с актуальным ETag
+отвечаем 304, не обращаясь к БД.
+
+Бэкенды:
+- "memory" — в памяти процесса, LRU + TTL + лимит по байтам.
+  Версии тоже локальны: процесс, не видевший записи, продолжал бы
+  отвечать 304 на старый ETag, а после TTL отдал бы новое тело под ним
+  же. Поэтому только для одного процесса, gunicorn.conf.py с ним
+  несколько воркеров не запускает;
+- "redis" — общий для всех процессов (нужен пакет redis).
+"""
+
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from .config import settings
+
+
+class CacheBackend:
+    """Интерфейс хранилища снапшотов и версий вишлистов."""
+
+    epoch: str
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def get_version(self, public_id: str) -> int:
+        raise NotImplementedError
+
+    async def bump_version(self, public_id: str) -> int:
+        raise NotImplementedError
+
+    def after_fork(self) -> None:
+        """Сброс состояния, унаследованного от родительского процесса."""
+
+
+class InMemoryCacheBackend(CacheBackend):
+    def __init__(self, *, max_bytes: int, max_entries: int, max_versions: int) -> None:
+        # эпоха отличает ETag-и разных запусков процесса: счётчики версий
+        # после рестарта начинаются заново
+        self.epoch = secrets.token_hex(4)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_versions = max_versions
+
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._clock = 0
+        # Версия для вишлистов, которых нет в _versions. После вытеснения
+        # она не меньше последней выданной, так что ETag не повторяется.
+        self._version_floor = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    async def get_version(self, public_id: str) -> int:
+        version = self._versions.get(public_id)
+        if version is None:
+            return self._version_floor
+        self._versions.move_to_end(public_id)
+        return version
+
+    async def bump_version(self, public_id: str) -> int:
+        self._clock += 1
+        self._versions[public_id] = self._clock
+        self._versions.move_to_end(public_id)
+        while len(self._versions) > self.max_versions:
+            self._versions.popitem(last=False)
+            self._version_floor = self._clock
+        return self._clock
+
+    def _drop(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def after_fork(self) -> None:
+        # у каждого воркера свои счётчики версий, и эпоха должна быть своей,
+        # иначе одинаковые ETag-и разных воркеров означали бы разные данные
+        self.epoch = secrets.token_hex(4)
+        self._entries.clear()
+        self._bytes = 0
+        self._versions.clear()
+        self._clock = self._version_floor = 0
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Общий бэкенд: версии через INCR, снапшоты через SET EX.
+    Ограничение памяти задаётся на стороне Redis (maxmemory + allkeys-lru).
+    """
+
+    def __init__(self, url: str, *, prefix: str = "wishlist:") -> None:
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:  # pragma: no cover - зависит от окружения
+            raise RuntimeError(
+                "Для SNAPSHOT_CACHE_BACKEND=redis нужен пакет redis"
+            ) from exc
+        self._redis = redis_asyncio.from_url(url)
+        self._prefix = prefix
+        # версии в Redis переживают рестарт процессов, эпоха общая
+        self.epoch = "r"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(self._prefix + "snap:" + key)
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self._redis.set(self._prefix + "snap:" + key, value, ex=ttl)
+
+    async def get_version(self, public_id: str) -> int:
+        value = await self._redis.get(self._prefix + "ver:" + public_id)
+        return int(value) if value is not None else 0
+
+    async def bump_version(self, public_id: str) -> int:
+        return int(await self._redis.incr(self._prefix + "ver:" + public_id))
+
+
+class WishlistSnapshotCache:
+    def __init__(self, backend: CacheBackend, *, ttl: int) -> None:
+        self.backend = backend
+        self.ttl = ttl
+
+    async def etag(self, public_id: str, viewer_id: Optional[int]) -> str:
+        """Строгий ETag текущей версии вишлиста для конкретного зрителя."""
+        version = await self.backend.get_version(public_id)
+        return f'"{self.backend.epoch}-{version}-{viewer_id or 0}"'
+
+    async def get(self, public_id: str, etag: str) -> Optional[bytes]:
+        return await self.backend.get(f"{public_id}:{etag}")
+
+    async def put(self, public_id: str, etag: str, body: bytes) -> None:
+        await self.backend.set(f"{public_id}:{etag}", body, self.ttl)
+
+    async def invalidate(self, public_id: str) -> int:
+        """Вызывается после каждой записи в вишлист."""
+        return await self.backend.bump_version(public_id)
+
+
+def _etag_candidates(if_none_match: Optional[str]) -> List[str]:
+    return [c.strip() for c in if_none_match.split(",")] if if_none_match else []
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Клиент прислал именно этот ETag; «*» проверяет matches_any_etag."""
+    return etag in _etag_candidates(if_none_match)
+
+
+def matches_any_etag(if_none_match: Optional[str]) -> bool:
+    """
+    If-None-Match: * — совпадает с любым представлением, но только
+    существующим: вызывающий сначала убеждается, что ресурс есть.
+    """
+    return "*" in _etag_candidates(if_none_match)
+
+
+def _make_backend() -> CacheBackend:
+    if settings.SNAPSHOT_CACHE_BACKEND == "redis":
+        if not settings.SNAPSHOT_CACHE_URL:
+            raise RuntimeError("SNAPSHOT_CACHE_URL обязателен для redis-бэкенда")
+        return RedisCacheBackend(settings.SNAPSHOT_CACHE_URL)
+    return InMemoryCacheBackend(
+        max_bytes=settings.SNAPSHOT_CACHE_MAX_BYTES,
+        max_entries=settings.SNAPSHOT_CACHE_MAX_ENTRIES,
+        max_versions=settings.SNAPSHOT_CACHE_MAX_VERSIONS,
+    )
+
+
+snapshot_cache = WishlistSnapshotCache(_make_backend(), ttl=settings.SNAPSHOT_CACHE_TTL_SECONDS)
+os.register_at_fork(after_in_child=snapshot_cache.backend.after_fork)
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import List
+from typing import List, Optional
 
 from pydantic import AnyHttpUrl, BaseSettings
 
@@ -8,10 +8,111 @@ class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
 
     DATABASE_URL: str
+    # Если не задан, выводится из DATABASE_URL (postgresql -> postgresql+asyncpg)
+    ASYNC_DATABASE_URL: Optional[str] = None
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRES_MINUTES: int = 60 * 24 * 7  # 7 days
 
+    # bcrypt: стоимость и отдельный ограниченный пул ("thread" или "process").
+    # При PASSWORD_HASH_MAX_PENDING операций в работе новые получают 503.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+
+    # Кэш токен -> пользователь в deps.py
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10_000
+
+    # Кэш снапшотов публичных вишлистов: "memory" или "redis"
+    SNAPSHOT_CACHE_BACKEND: str = "memory"
+    SNAPSHOT_CACHE_URL: Optional[str] = None
+    SNAPSHOT_CACHE_TTL_SECONDS: int = 30
+    SNAPSHOT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SNAPSHOT_CACHE_MAX_ENTRIES: int = 10_000
+    SNAPSHOT_CACHE_MAX_VERSIONS: int = 100_000
+
+    # Realtime: размер очереди исходящих сообщений на сокет и что делать,
+    # когда она переполнена: drop_oldest / coalesce / disconnect
+    WS_SEND_QUEUE_SIZE: int = 64
+    WS_SLOW_CONSUMER_POLICY: str = "coalesce"
+    # Сколько секунд задача-писатель сокета ждёт новых сообщений, прежде
+    # чем завершиться: у активных сокетов рассылка только будит писателя,
+    # у тихих задачи нет вовсе
+    WS_WRITER_IDLE_SECONDS: float = 10.0
+    # Рассылка между инстансами: "memory" (один процесс) или "postgres" (LISTEN/NOTIFY)
+    REALTIME_BROKER: str = "memory"
+    # Буфер последних событий вишлиста для переподключений с last_seq
+    WS_REPLAY_MAX_EVENTS: int = 256
+    WS_REPLAY_MAX_BYTES: int = 256 * 1024
+    WS_REPLAY_LINGER_SECONDS: float = 60.0
+    # Склейка всплесков: рассылка через window секунд тишины, но не позже
+    # max_delay после первой записи; 0 — рассылать каждое событие сразу
+    WS_COALESCE_WINDOW_SECONDS: float = 0.05
+    WS_COALESCE_MAX_DELAY_SECONDS: float = 0.25
+    # Heartbeat: молчащему WS_HEARTBEAT_INTERVAL_SECONDS сокету уходит ping,
+    # молчащий дольше WS_HEARTBEAT_TIMEOUT_SECONDS закрывается (мёртвые
+    # и полуоткрытые соединения); 0 в интервале — без heartbeat
+    WS_HEARTBEAT_INTERVAL_SECONDS: float = 25.0
+    WS_HEARTBEAT_TIMEOUT_SECONDS: float = 60.0
+
+    # Пулы соединений. Если задан DB_CONNECTION_BUDGET — сколько соединений
+    # с Postgres может занять весь инстанс, — размеры пулов делятся между
+    # WEB_CONCURRENCY воркерами (см. database.pool_limits)
+    WEB_CONCURRENCY: int = 1
+    DB_CONNECTION_BUDGET: Optional[int] = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+
+    # Реплика для чтения (публичные страницы, списки пользователя), URL
+    # в том же виде, что DATABASE_URL. Пул у неё такой же, как у основной
+    # базы (у реплики свой лимит соединений). Пока отставание больше
+    # REPLICA_MAX_LAG_SECONDS, и столько же после своей записи, пользователь
+    # читает с основной базы (см. replicas.py)
+    REPLICA_DATABASE_URL: Optional[str] = None
+    REPLICA_MAX_LAG_SECONDS: float = 2.0
+    REPLICA_LAG_CHECK_SECONDS: float = 1.0
+
+    # Ограничение частоты (token bucket, см. limits.py): у записей ведро на
+    # пару (маршрут, пользователь), у входа и регистрации — на IP.
+    # Вёдра "memory" — свои у каждого процесса, "redis" — общие (RATE_LIMIT_URL).
+    # RATE_LIMIT_ENABLED=false выключает все лимиты на клиента, включая
+    # WS_MAX_CONNECTIONS_PER_IP
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_URL: Optional[str] = None
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    RATE_LIMIT_WRITES_PER_SECOND: float = 2.0
+    RATE_LIMIT_WRITES_BURST: int = 20
+    RATE_LIMIT_AUTH_PER_SECOND: float = 0.2
+    RATE_LIMIT_AUTH_BURST: int = 10
+
+    # Приём HTTP-запросов: в работе не больше MAX_CONCURRENT_REQUESTS на процесс
+    # (по умолчанию — пул соединений с overflow), ещё ADMISSION_QUEUE_SIZE ждут
+    # не дольше ADMISSION_QUEUE_TIMEOUT_SECONDS, остальные сразу получают 503
+    MAX_CONCURRENT_REQUESTS: Optional[int] = None
+    ADMISSION_QUEUE_SIZE: int = 64
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 1.0
+
+    # WebSocket на процесс: сокетов на вишлист и с одного IP, частота
+    # подключений с IP и запросов resync от сокета (лишние игнорируются)
+    WS_MAX_CONNECTIONS_PER_WISHLIST: int = 1000
+    WS_MAX_CONNECTIONS_PER_IP: int = 50
+    WS_CONNECTS_PER_SECOND: float = 1.0
+    WS_CONNECTS_BURST: int = 20
+    WS_RESYNCS_PER_SECOND: float = 0.2
+    WS_RESYNCS_BURST: int = 3
+
+    # Запросы дольше порога пишутся в журнал вместе с их SQL; None — выключено
+    SLOW_REQUEST_SECONDS: Optional[float] = None
+
+    # Массовый импорт подарков (POST /wishlists/{id}/items/bulk)
+    BULK_ITEMS_MAX_ROWS: int = 1000
+    BULK_ITEMS_MAX_BYTES: int = 1024 * 1024
+
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = [
         "http://localhost:5173",
         "http://127.0.0.1:5173",
@@ -1,31 +1,199 @@
+import os
+from typing import AsyncIterator, Optional, Tuple
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from .config import settings
+from .instrumentation import TimedAsyncQueuePool, TimedQueuePool, instrument_engine
 
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Асинхронные драйверы для синхронных URL из DATABASE_URL.
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-Base = declarative_base()
 
+def get_async_database_url() -> str:
+    """
+    URL для асинхронного движка.
 
-def init_db() -> None:
+    Если ASYNC_DATABASE_URL не задан, берём DATABASE_URL и подменяем драйвер
+    на asyncio-совместимый (postgresql -> asyncpg, sqlite -> aiosqlite).
     """
-    Initialize database schema.
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return _async_url(settings.DATABASE_URL)
+
+
+def _async_url(database_url: str) -> str:
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise RuntimeError(f"Нет асинхронного драйвера для {url.drivername}")
+    return url.set(drivername=_ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
 
-    For простоты в тестовом задании создаём таблицы через SQLAlchemy,
-    в продакшене лучше использовать Alembic миграции.
+
+def pool_limits() -> Tuple[int, int]:
+    """
+    (pool_size, max_overflow) асинхронного пула одного воркера.
+
+    С DB_CONNECTION_BUDGET бюджет делится поровну между WEB_CONCURRENCY
+    воркерами. Из доли воркера одно соединение остаётся синхронному
+    движку и ещё одно — LISTEN-соединению брокера postgres, остальное
+    пополам между постоянной частью пула и overflow.
     """
-    from . import models  # noqa: F401
+    budget = settings.DB_CONNECTION_BUDGET
+    if budget is None:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    reserved = 1 + (settings.REALTIME_BROKER == "postgres")
+    per_worker = budget // max(1, settings.WEB_CONCURRENCY) - reserved
+    if per_worker < 1:
+        raise RuntimeError(
+            f"DB_CONNECTION_BUDGET={budget} мало для {settings.WEB_CONCURRENCY} воркеров: "
+            f"нужно хотя бы по {reserved + 1} соединения на воркер"
+        )
+    pool_size = max(1, per_worker // 2)
+    return pool_size, per_worker - pool_size
+
 
-    Base.metadata.create_all(bind=engine)
+def _pool_options(name: str, pool_class: type, pool_size: int, max_overflow: int) -> dict:
+    # pool_class пишет время ожидания соединения с меткой name
+    timed = {"poolclass": pool_class, "pool_logging_name": name}
+    url = make_url(settings.DATABASE_URL)
+    # у пулов SQLite другие параметры; файловой базе SQLAlchemy и так
+    # даёт QueuePool, in-memory — свой пул на одно соединение
+    if url.get_backend_name() == "sqlite":
+        return {} if url.database in (None, "", ":memory:") else timed
+    return {
+        **timed,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+
+
+# Фабрики сессий привязываются к движкам в init_engines().
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(
+    autoflush=False,
+    # после commit объекты остаются загруженными: ленивая подгрузка
+    # в async-режиме недоступна
+    expire_on_commit=False,
+)
+# Чтение с реплики; без REPLICA_DATABASE_URL — та же основная база.
+# Какую фабрику взять для запроса, решает replicas.read_sessionmaker.
+AsyncReplicaSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+_engines: Optional[Tuple[Engine, AsyncEngine]] = None
+_replica_engine: Optional[AsyncEngine] = None
+_engines_pid: Optional[int] = None
+
+
+def init_engines() -> Tuple[Engine, AsyncEngine]:
+    """
+    Создаёт движки в текущем процессе и привязывает к ним фабрики сессий.
+
+    Движки не создаются при импорте: мастер gunicorn (gunicorn.conf.py)
+    загружает приложение до fork, и соединения пула не должны
+    достаться всем воркерам сразу. Если движки достались процессу
+    от родителя, они пересоздаются.
+    """
+    global _engines, _replica_engine, _engines_pid
+    if _engines is not None and _engines_pid == os.getpid():
+        return _engines
+    if _engines is not None:
+        # соединения принадлежат родителю: отпускаем, не закрывая
+        inherited = [_engines[0], _engines[1].sync_engine]
+        if _replica_engine is not None:
+            inherited.append(_replica_engine.sync_engine)
+        for engine in inherited:
+            engine.dispose(close=False)
+
+    # Синхронный движок — для миграций, служебных скриптов и проверки
+    # схемы при старте, ему хватает одного соединения.
+    sync_engine = create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        **_pool_options("sync", TimedQueuePool, 1, 0),
+    )
+    # Асинхронный движок для обработчиков запросов: ожидание Postgres
+    # не блокирует event loop (а вместе с ним и WebSocket-подключения).
+    async_engine = create_async_engine(
+        get_async_database_url(),
+        pool_pre_ping=True,
+        **_pool_options("async", TimedAsyncQueuePool, *pool_limits()),
+    )
+    instrument_engine(sync_engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+
+    replica_engine = None
+    if settings.REPLICA_DATABASE_URL:
+        replica_engine = create_async_engine(
+            _async_url(settings.REPLICA_DATABASE_URL),
+            pool_pre_ping=True,
+            **_pool_options("replica", TimedAsyncQueuePool, *pool_limits()),
+        )
+        instrument_engine(replica_engine.sync_engine, "replica")
+
+    SessionLocal.configure(bind=sync_engine)
+    AsyncSessionLocal.configure(bind=async_engine)
+    AsyncReplicaSessionLocal.configure(bind=replica_engine or async_engine)
+    _engines, _replica_engine = (sync_engine, async_engine), replica_engine
+    _engines_pid = os.getpid()
+    return _engines
+
+
+async def dispose_engines() -> None:
+    """Закрывает пулы текущего процесса (при остановке воркера)."""
+    global _engines, _replica_engine, _engines_pid
+    if _engines is None or _engines_pid != os.getpid():
+        return
+    sync_engine, async_engine = _engines
+    replica_engine = _replica_engine
+    _engines = _replica_engine = _engines_pid = None
+    await async_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+    sync_engine.dispose()
+
+
+def get_engine() -> Engine:
+    return init_engines()[0]
+
+
+def get_async_engine() -> AsyncEngine:
+    return init_engines()[1]
+
+
+def get_replica_engine() -> Optional[AsyncEngine]:
+    """Движок реплики или None, если REPLICA_DATABASE_URL не задан."""
+    init_engines()
+    return _replica_engine
+
+
+Base = declarative_base()
 
 
 def get_db():
+    init_engines()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    init_engines()
+    async with AsyncSessionLocal() as db:
+        yield db
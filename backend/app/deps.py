@@ -1,34 +1,74 @@
+import time
 from typing import Optional
 
-from fastapi import Cookie, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import Cookie, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import auth
-from .database import get_db
+from .database import get_async_db
+from .limits import RateLimit, client_ip, rate_limiter
 from .models import User
+from .principals import Principal, principal_cache, token_cache
 
 
-def get_current_user_optional(
-    db: Session = Depends(get_db),
+def get_current_user_id_optional(
     access_token: Optional[str] = Cookie(default=None, alias=auth.AUTH_COOKIE_NAME),
-) -> Optional[User]:
+) -> Optional[int]:
     """
-    Текущий пользователь, если авторизован.
-    Для публичных страниц можем не требовать авторизацию.
+    id текущего пользователя только по токену, без запроса в БД.
     """
     if not access_token:
         return None
+    user_id = token_cache.get(access_token)
+    if user_id is not None:
+        return user_id
     payload = auth.decode_access_token(access_token)
     if not payload or "sub" not in payload:
         return None
     user_id = int(payload["sub"])
-    user = db.query(User).filter(User.id == user_id).first()
-    return user
+    # запись не должна пережить сам токен
+    ttl = payload["exp"] - time.time() if "exp" in payload else None
+    token_cache.set(access_token, user_id, ttl=ttl)
+    return user_id
+
+
+def get_current_principal_optional(
+    user_id: Optional[int] = Depends(get_current_user_id_optional),
+) -> Optional[Principal]:
+    """
+    Лёгкий Principal только с id — для обработчиков, которым больше ничего
+    не нужно. Пользователь из БД не загружается.
+    """
+    if user_id is None:
+        return None
+    return Principal(id=user_id)
+
+
+async def get_current_user_optional(
+    db: AsyncSession = Depends(get_async_db),
+    user_id: Optional[int] = Depends(get_current_user_id_optional),
+) -> Optional[Principal]:
+    """
+    Текущий пользователь, если авторизован.
+    Для публичных страниц можем не требовать авторизацию.
+    """
+    if user_id is None:
+        return None
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    user = await db.scalar(select(User).where(User.id == user_id))
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.set(user_id, principal)
+    return principal
 
 
 def get_current_user(
-    user: Optional[User] = Depends(get_current_user_optional),
-) -> User:
+    user: Optional[Principal] = Depends(get_current_user_optional),
+) -> Principal:
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,3 +76,29 @@ def get_current_user(
         )
     return user
 
+
+def get_current_principal(
+    principal: Optional[Principal] = Depends(get_current_principal_optional),
+) -> Principal:
+    if not principal:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Требуется авторизация",
+        )
+    return principal
+
+
+def rate_limit(rule: RateLimit):
+    """
+    Зависимость для dependencies=[...] маршрута: ведро по правилу rule
+    на пользователя из токена, для анонима — на IP. Исчерпано — 429.
+    """
+
+    async def dependency(
+        request: Request,
+        user_id: Optional[int] = Depends(get_current_user_id_optional),
+    ) -> None:
+        subject = f"user:{user_id}" if user_id is not None else "ip:" + client_ip(request)
+        await rate_limiter.check(rule, subject)
+
+    return Depends(dependency)
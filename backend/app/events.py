@@ -0,0 +1,132 @@
+"""
+Сообщения realtime-протокола вишлиста (/ws/wishlists/{public_id}).
+
+Сервер -> клиент:
+- wishlist_snapshot        — полный WishlistPublicOut, при подписке и по запросу resync;
+- item_added               — новый подарок целиком;
+- items_added              — несколько новых подарков (массовый импорт);
+- item_funding_changed     — id, total_contributed, is_fully_funded;
+- item_reservation_changed — id, has_reservation;
+- items_changed            — пачка дельт подряд идущих событий from_seq..seq.
+
+items_changed появляется, когда несколько записей в вишлист попали в одно
+окно рассылки (см. realtime.BroadcastScheduler): items — итоговые поля
+каждого затронутого подарка (новые подарки целиком, у остальных только
+изменившиеся поля), клиент сливает их в свои карточки по id.
+
+У каждого сообщения есть seq: номер события в вишлисте (Wishlist.event_seq),
+растущий на единицу с каждой записью. Клиент применяет дельты с
+seq == last_seq + 1, пропускает seq <= last_seq, а при разрыве
+(seq > last_seq + 1) отправляет {"type": "resync"} и получает снапшот.
+У items_changed вместо seq == last_seq + 1 проверяется
+from_seq <= last_seq + 1 < seq + 1.
+
+При переподключении клиент передаёт ?last_seq=N: если сервер ещё помнит
+события после N, досылаются только они, без снапшота.
+
+Heartbeat: сокету, от которого давно ничего не приходило, сервер шлёт
+{"type": "ping"}; клиент отвечает {"type": "pong"} (годится и любое
+другое сообщение). Сокет, молчащий дольше WS_HEARTBEAT_TIMEOUT_SECONDS,
+сервер закрывает с кодом 4408.
+
+Все сообщения обезличены (без you_*): личные поля клиент берёт по HTTP.
+"""
+
+from typing import Dict, List
+
+from .money import from_cents
+from .schemas import WishlistItemPublic, WishlistPublicOut
+
+WISHLIST_SNAPSHOT = "wishlist_snapshot"
+ITEM_ADDED = "item_added"
+ITEMS_ADDED = "items_added"
+ITEM_FUNDING_CHANGED = "item_funding_changed"
+ITEM_RESERVATION_CHANGED = "item_reservation_changed"
+ITEMS_CHANGED = "items_changed"
+
+# сервер -> клиент и ответ клиента
+PING = "ping"
+PONG = "pong"
+
+# клиент -> сервер
+RESYNC = "resync"
+
+
+# Сообщения кодируются через serialization.dumps: модели внутри допустимы,
+# суммы — копейки, как в WishlistItemPublic. Карточки подарков — плоские dict,
+# чтобы их можно было сливать в coalesce_events.
+
+
+def snapshot_event(public: WishlistPublicOut) -> dict:
+    return {"type": WISHLIST_SNAPSHOT, "seq": public.seq, "wishlist": public}
+
+
+def item_added_event(seq: int, item: WishlistItemPublic) -> dict:
+    return {"type": ITEM_ADDED, "seq": seq, "item": dict(item)}
+
+
+def items_added_event(seq: int, items: List[WishlistItemPublic]) -> dict:
+    return {"type": ITEMS_ADDED, "seq": seq, "items": [dict(item) for item in items]}
+
+
+def item_funding_changed_event(
+    seq: int, item_id: int, *, total_contributed_cents: int, price_cents: int
+) -> dict:
+    return {
+        "type": ITEM_FUNDING_CHANGED,
+        "seq": seq,
+        "item": {
+            "id": item_id,
+            "total_contributed_cents": total_contributed_cents,
+            # устаревшее: рубли float
+            "total_contributed": from_cents(total_contributed_cents),
+            "is_fully_funded": total_contributed_cents >= price_cents,
+        },
+    }
+
+
+def item_reservation_changed_event(seq: int, item_id: int, *, has_reservation: bool) -> dict:
+    return {
+        "type": ITEM_RESERVATION_CHANGED,
+        "seq": seq,
+        "item": {"id": item_id, "has_reservation": has_reservation},
+    }
+
+
+def event_from_seq(message: dict) -> int:
+    """Первый seq, который покрывает сообщение (у пачки — from_seq)."""
+    return message.get("from_seq", message["seq"])
+
+
+def coalesce_events(messages: List[dict]) -> List[dict]:
+    """
+    Сжимает дельты одного вишлиста: каждая непрерывная серия seq
+    становится одним items_changed (одиночное событие остаётся как есть).
+    Разрыв в seq означает, что между событиями писал другой инстанс, —
+    такие серии не склеиваются, иначе клиент пропустил бы чужие события.
+    """
+    runs: List[List[dict]] = []
+    for message in sorted(messages, key=lambda m: m["seq"]):
+        if runs and event_from_seq(message) <= runs[-1][-1]["seq"] + 1:
+            runs[-1].append(message)
+        else:
+            runs.append([message])
+
+    coalesced = []
+    for run in runs:
+        if len(run) == 1:
+            coalesced.append(run[0])
+            continue
+        items: Dict[int, dict] = {}
+        for message in run:
+            for item in message.get("items") or [message["item"]]:
+                items.setdefault(item["id"], {}).update(item)
+        coalesced.append(
+            {
+                "type": ITEMS_CHANGED,
+                "from_seq": event_from_seq(run[0]),
+                "seq": run[-1]["seq"],
+                "items": list(items.values()),
+            }
+        )
+    return coalesced
@@ -0,0 +1,130 @@
+"""
+Хэширование паролей (bcrypt) вне event loop.
+
+bcrypt намеренно медленный, поэтому вызовы уходят в отдельный
+ограниченный пул (потоки или процессы). Число ожидающих задач тоже
+ограничено: при переполнении бросаем HashingBusy, и обработчик отвечает
+503 с Retry-After, вместо того чтобы копить очередь и голодать воркер.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from . import metrics
+from .config import settings
+
+HASH_SECONDS = metrics.histogram(
+    "password_hash_seconds",
+    "Время bcrypt-операции, включая ожидание в очереди пула",
+    ("operation",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+HASH_QUEUE_DEPTH = metrics.gauge(
+    "password_hash_queue_depth", "bcrypt-операции в пуле и в очереди к нему"
+)
+HASH_REJECTED = metrics.counter(
+    "password_hash_rejected_total", "Запросы, отклонённые из-за переполнения пула bcrypt"
+)
+
+
+class HashingBusy(Exception):
+    """Пул bcrypt перегружен, запрос стоит повторить позже."""
+
+
+@lru_cache()
+def _context(rounds: int) -> CryptContext:
+    # min = max = rounds: хэш с другой стоимостью считается устаревшим,
+    # и verify_and_update пересчитывает его при входе
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# Функции верхнего уровня, чтобы их можно было передать в ProcessPoolExecutor.
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        *,
+        rounds: int,
+        workers: int,
+        max_pending: int,
+        executor: str = "thread",
+    ) -> None:
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor_kind = executor
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        # пул создаётся лениво: после fork в воркере, а не в родительском процессе
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _run(self, operation: str, func, *args):
+        if self._pending >= self.max_pending:
+            HASH_REJECTED.inc()
+            raise HashingBusy()
+        self._pending += 1
+        HASH_QUEUE_DEPTH.set(self._pending)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+            HASH_QUEUE_DEPTH.set(self._pending)
+            HASH_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password, self.rounds)
+
+    async def verify_and_update(
+        self, password: str, hashed: str
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Проверяет пароль. Если хэш устарел (например, сменился BCRYPT_ROUNDS),
+        вторым элементом возвращает новый хэш, который нужно сохранить.
+        """
+        return await self._run("verify", _verify_and_update, password, hashed, self.rounds)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+)
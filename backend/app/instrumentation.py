@@ -0,0 +1,244 @@
+"""
+Инструментирование запросов: время по маршрутам, SQL-запросы и пул
+соединений. Всё пишется в metrics.REGISTRY и отдаётся на /metrics.
+
+- MetricsMiddleware — чистый ASGI (без BaseHTTPMiddleware): время запроса
+  по шаблону маршрута, число и время SQL за запрос, журнал медленных
+  запросов вместе с их SQL (SLOW_REQUEST_SECONDS);
+- instrument_engine — события SQLAlchemy before/after_cursor_execute
+  и число выданных соединений пула;
+- TimedQueuePool, TimedAsyncQueuePool — пулы, которые пишут время
+  ожидания соединения и таймауты ожидания;
+- report_ready — холодный старт процесса: от запуска (у воркера
+  gunicorn — от fork) до готовности приложения;
+- track_queries — те же счётчики SQL для кода вне HTTP-запроса.
+
+Статистика текущего запроса лежит в ContextVar: события SQLAlchemy
+срабатывают в контексте задачи запроса (и в async-режиме тоже).
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from . import metrics
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+HTTP_SECONDS = metrics.histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ("method", "route", "status"),
+)
+HTTP_DB_QUERIES = metrics.histogram(
+    "http_request_db_queries",
+    "SQL-запросов на один HTTP-запрос",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+DB_QUERY_SECONDS = metrics.histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса", ("operation",)
+)
+DB_POOL_WAIT_SECONDS = metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание свободного соединения в пуле",
+    ("engine",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_TIMEOUTS = metrics.counter(
+    "db_pool_checkout_timeouts_total",
+    "Соединение из пула не дождались за pool_timeout",
+    ("engine",),
+)
+DB_POOL_CHECKED_OUT = metrics.gauge(
+    "db_pool_checked_out", "Соединения, выданные из пула", ("engine",)
+)
+COLD_START_SECONDS = metrics.gauge(
+    "process_cold_start_seconds", "От запуска или fork процесса до готовности приложения"
+)
+
+# сколько SQL одного запроса держать для журнала медленных запросов
+_MAX_STATEMENTS = 20
+_UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.0
+        # (секунды, SQL) — самые долгие запросы
+        self.statements: List[Tuple[float, str]] = []
+
+    def record(self, seconds: float, statement: str) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        if len(self.statements) < _MAX_STATEMENTS:
+            self.statements.append((seconds, statement))
+        elif seconds > self.statements[-1][0]:
+            self.statements[-1] = (seconds, statement)
+        else:
+            return
+        self.statements.sort(key=lambda s: s[0], reverse=True)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[RequestStats]:
+    """SQL-статистика блока кода вне HTTP-запроса: скрипты, bench."""
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _operation(statement: str) -> str:
+    words = statement.split(None, 1)
+    word = words[0].upper() if words else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+class _TimedCheckout:
+    """
+    Время ожидания соединения (DB_POOL_WAIT_SECONDS) и таймауты ожидания.
+    У пула нет события «начали ждать соединение», поэтому время снимает
+    _do_get подкласса — он и ждёт свободное соединение (или создаёт новое).
+    Метка engine — pool_logging_name движка: она переживает recreate()
+    пула при dispose().
+    """
+
+    def _do_get(self):
+        engine = self.logging_name or "default"
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.inc(engine=engine)
+            raise
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started, engine=engine)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """
+    Подключает метрики SQL и число выданных соединений пула к движку.
+    Для AsyncEngine передаётся его sync_engine. Сборщик пула хранится
+    под именем движка: пересозданный движок заменяет прежний, а не
+    добавляется к нему.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        seconds = time.perf_counter() - context._query_started
+        DB_QUERY_SECONDS.observe(seconds, operation=_operation(statement))
+        stats = _current.get()
+        if stats is not None:
+            stats.record(seconds, statement)
+
+    metrics.REGISTRY.add_collector(
+        f"db_pool:{name}",
+        lambda: DB_POOL_CHECKED_OUT.set(engine.pool.checkedout(), engine=name),
+    )
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+        self._routes: Optional[Dict[object, str]] = None
+
+    def _route(self, scope) -> str:
+        # Router дописывает в scope endpoint найденного маршрута;
+        # в метку идёт шаблон пути, а не сам путь — иначе метки не ограничены
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return _UNMATCHED_ROUTE
+        if self._routes is None:
+            self._routes = {
+                getattr(route, "endpoint", None): route.path for route in scope["app"].routes
+            }
+        return self._routes.get(endpoint, _UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            seconds = time.perf_counter() - started
+            route = self._route(scope)
+            HTTP_SECONDS.observe(seconds, method=scope["method"], route=route, status=str(status))
+            HTTP_DB_QUERIES.observe(stats.queries, route=route)
+            threshold = settings.SLOW_REQUEST_SECONDS
+            if threshold is not None and seconds >= threshold:
+                _log_slow(scope, route, status, seconds, stats)
+
+
+_process_started = time.monotonic()
+
+
+def _mark_process_start() -> None:
+    global _process_started
+    _process_started = time.monotonic()
+
+
+# воркер получает образ мастера с уже импортированным приложением,
+# его холодный старт считается от fork
+os.register_at_fork(after_in_child=_mark_process_start)
+
+
+def report_ready() -> float:
+    """Вызывается последним обработчиком startup; возвращает секунды."""
+    seconds = time.monotonic() - _process_started
+    COLD_START_SECONDS.set(seconds)
+    logger.info("Процесс %s готов за %.3f с", os.getpid(), seconds)
+    return seconds
+
+
+def _log_slow(scope, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+    lines = [
+        f"Медленный запрос {scope['method']} {scope['path']} ({route}) -> {status}: "
+        f"{seconds * 1000:.1f} мс, SQL: {stats.queries} шт, {stats.db_seconds * 1000:.1f} мс"
+    ]
+    for query_seconds, statement in stats.statements:
+        lines.append(f"  {query_seconds * 1000:8.1f} мс  {' '.join(statement.split())}")
+    logger.warning("\n".join(lines))
@@ -0,0 +1,363 @@
+"""
+Защита от перегрузки и злоупотреблений.
+
+- RateLimiter — token bucket на пару (правило, пользователь или IP):
+  ведро вмещает burst запросов и пополняется со скоростью rate в секунду.
+  Исчерпал — 429 с Retry-After (зависимость deps.rate_limit). Вёдра
+  хранятся в RateLimitStore: в памяти процесса или в redis, общие для
+  всех воркеров и инстансов (RATE_LIMIT_BACKEND);
+- AdmissionMiddleware — не больше max_concurrent HTTP-запросов в работе
+  на процесс. Лишние ждут в короткой очереди; при её переполнении или по
+  таймауту сразу получают 503, а не ждут соединение пула до
+  DB_POOL_TIMEOUT_SECONDS. Место освобождается с началом ответа:
+  медленный читатель потокового ответа его не держит;
+- WebSocketLimiter — число сокетов процесса на вишлист и на IP.
+
+IP клиента берётся из scope["client"]; за прокси uvicorn подставляет
+его из X-Forwarded-For (--forwarded-allow-ips).
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from starlette.requests import HTTPConnection
+
+from . import metrics
+from .config import settings
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = metrics.counter(
+    "rate_limited_total", "Запросы, отклонённые ограничением частоты", ("rule",)
+)
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight", "HTTP-запросы в работе, без ожидающих в очереди"
+)
+REQUESTS_SHED = metrics.counter(
+    "http_requests_shed_total", "HTTP-запросы, отклонённые с 503 из-за перегрузки", ("reason",)
+)
+WS_REJECTED = metrics.counter(
+    "ws_connections_rejected_total", "Отклонённые WebSocket-подключения", ("reason",)
+)
+
+BUSY_DETAIL = "Сервис перегружен, попробуйте позже"
+
+
+class RateLimit:
+    """Правило: имя (часть ключа ведра), пополнение в секунду и ёмкость."""
+
+    __slots__ = ("name", "rate", "burst")
+
+    def __init__(self, name: str, rate: float, burst: int) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """0 — токен взят; иначе через сколько секунд он появится."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimitStore:
+    """Хранилище вёдер."""
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """0 — пропустить; иначе через сколько секунд появится токен."""
+        raise NotImplementedError
+
+    def after_fork(self) -> None:
+        """Сбросить состояние, унаследованное от мастера."""
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """
+    Вёдра процесса, не больше max_keys: вытесняются давно не тронутые.
+    Под gunicorn у каждого воркера свои вёдра, и реальный предел —
+    предел правила, умноженный на число воркеров.
+    """
+
+    def __init__(self, *, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take()
+
+    def after_fork(self) -> None:
+        self._buckets.clear()
+
+
+# Ведро — hash {tokens, updated}. Время берётся у redis, чтобы не зависеть
+# от часов инстансов; ключ живёт, пока ведро не наполнится снова.
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """Вёдра в redis, общие для всех процессов; ведро меняется атомарно (Lua)."""
+
+    def __init__(self, url: str, *, prefix: str = "wishlist:ratelimit:") -> None:
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:  # pragma: no cover
+            raise RuntimeError("Для RATE_LIMIT_BACKEND=redis нужен пакет redis") from exc
+        self._redis = redis_asyncio.from_url(url)
+        self._prefix = prefix
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return float(await self._take(keys=[self._prefix + key], args=[rate, burst]))
+
+
+class RateLimiter:
+    def __init__(self, store: RateLimitStore, *, enabled: bool = True) -> None:
+        self.store = store
+        self.enabled = enabled
+        self._store_failing = False
+
+    async def hit(self, rule: RateLimit, subject: str) -> float:
+        """
+        Снимает токен из ведра subject по правилу rule; 0 — пропустить,
+        иначе через сколько секунд повторить. Если хранилище недоступно,
+        запрос пропускается: без лимитов лучше, чем без записей.
+        """
+        if not self.enabled:
+            return 0.0
+        try:
+            wait = await self.store.take(f"{rule.name}:{subject}", rule.rate, rule.burst)
+        except Exception:
+            if not self._store_failing:
+                logger.exception("Хранилище лимитов недоступно, запросы пропускаются")
+            self._store_failing = True
+            return 0.0
+        self._store_failing = False
+        if wait:
+            RATE_LIMITED.inc(rule=rule.name)
+        return wait
+
+    async def check(self, rule: RateLimit, subject: str) -> None:
+        """hit, который при исчерпании ведра бросает 429."""
+        wait = await self.hit(rule, subject)
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много запросов, попробуйте позже",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+def client_ip(connection: HTTPConnection) -> str:
+    return connection.client.host if connection.client else "unknown"
+
+
+def limit_by_ip(rule: RateLimit):
+    """
+    Зависимость для dependencies=[...] маршрута: ведро на IP клиента
+    (вход, регистрация). Ведро на пользователя — deps.rate_limit.
+    """
+
+    async def dependency(request: Request) -> None:
+        await rate_limiter.check(rule, "ip:" + client_ip(request))
+
+    return Depends(dependency)
+
+
+class AdmissionMiddleware:
+    """
+    Ограничивает число HTTP-запросов в работе. Чистый ASGI; отказ — 503
+    с Retry-After. Пути из exempt_paths (метрики) пропускаются всегда.
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        max_concurrent: int,
+        queue_size: int,
+        queue_timeout: float,
+        exempt_paths=("/metrics",),
+    ) -> None:
+        self.app = app
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.exempt_paths = frozenset(exempt_paths)
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        retry_after = str(max(1, math.ceil(queue_timeout)))
+        self._reject_headers = [
+            (b"content-type", b"application/json"),
+            (b"retry-after", retry_after.encode()),
+        ]
+        self._reject_body = dumps({"detail": BUSY_DETAIL})
+
+    async def _admit(self) -> bool:
+        # locked() учитывает и ожидающих: новый запрос не обгоняет очередь
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return True
+        if self._waiting >= self.queue_size:
+            REQUESTS_SHED.inc(reason="queue_full")
+            return False
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            REQUESTS_SHED.inc(reason="queue_timeout")
+            return False
+        finally:
+            self._waiting -= 1
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self._admit():
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "headers": self._reject_headers,
+                }
+            )
+            await send({"type": "http.response.body", "body": self._reject_body})
+            return
+
+        REQUESTS_IN_FLIGHT.inc()
+        admitted = True
+
+        def release() -> None:
+            nonlocal admitted
+            if admitted:
+                admitted = False
+                REQUESTS_IN_FLIGHT.dec()
+                self._semaphore.release()
+
+        async def send_wrapper(message) -> None:
+            # Обработчик отработал, дальше только передача тела. Потоковый
+            # ответ (NDJSON) сам берёт короткие сессии на каждую страницу
+            # и не должен занимать место, пока клиент читает.
+            if message["type"] == "http.response.start":
+                release()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            release()
+
+
+class WebSocketLimiter:
+    """Счётчики сокетов процесса по вишлисту и по IP; per_ip None — без лимита."""
+
+    def __init__(self, *, per_wishlist: int, per_ip: Optional[int]) -> None:
+        self.per_wishlist = per_wishlist
+        self.per_ip = per_ip
+        self._by_wishlist: Dict[str, int] = {}
+        self._by_ip: Dict[str, int] = {}
+
+    def acquire(self, wishlist_public_id: str, ip: str) -> bool:
+        if self._by_wishlist.get(wishlist_public_id, 0) >= self.per_wishlist:
+            WS_REJECTED.inc(reason="wishlist")
+            return False
+        if self.per_ip is not None and self._by_ip.get(ip, 0) >= self.per_ip:
+            WS_REJECTED.inc(reason="ip")
+            return False
+        self._by_wishlist[wishlist_public_id] = self._by_wishlist.get(wishlist_public_id, 0) + 1
+        self._by_ip[ip] = self._by_ip.get(ip, 0) + 1
+        return True
+
+    def release(self, wishlist_public_id: str, ip: str) -> None:
+        for counts, key in ((self._by_wishlist, wishlist_public_id), (self._by_ip, ip)):
+            left = counts.get(key, 0) - 1
+            if left > 0:
+                counts[key] = left
+            else:
+                counts.pop(key, None)
+
+
+def _write_rule(name: str) -> RateLimit:
+    return RateLimit(name, settings.RATE_LIMIT_WRITES_PER_SECOND, settings.RATE_LIMIT_WRITES_BURST)
+
+
+def _auth_rule(name: str) -> RateLimit:
+    return RateLimit(name, settings.RATE_LIMIT_AUTH_PER_SECOND, settings.RATE_LIMIT_AUTH_BURST)
+
+
+# Записи: у каждого маршрута своё ведро на пользователя
+CREATE_WISHLIST = _write_rule("create_wishlist")
+ADD_ITEMS = _write_rule("add_items")
+RESERVE = _write_rule("reserve")
+CONTRIBUTE = _write_rule("contribute")
+# Вход и регистрация считают bcrypt: ведро на IP
+LOGIN = _auth_rule("login")
+REGISTER = _auth_rule("register")
+# Подключения WebSocket с одного IP и resync одного сокета
+WS_CONNECT = RateLimit("ws_connect", settings.WS_CONNECTS_PER_SECOND, settings.WS_CONNECTS_BURST)
+WS_RESYNC = RateLimit("ws_resync", settings.WS_RESYNCS_PER_SECOND, settings.WS_RESYNCS_BURST)
+
+
+def _make_store() -> RateLimitStore:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        if not settings.RATE_LIMIT_URL:
+            raise RuntimeError("RATE_LIMIT_URL обязателен для redis-бэкенда")
+        return RedisRateLimitStore(settings.RATE_LIMIT_URL)
+    return InMemoryRateLimitStore(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = RateLimiter(_make_store(), enabled=settings.RATE_LIMIT_ENABLED)
+os.register_at_fork(after_in_child=rate_limiter.store.after_fork)
+
+ws_limiter = WebSocketLimiter(
+    per_wishlist=settings.WS_MAX_CONNECTIONS_PER_WISHLIST,
+    # лимиты на клиента выключаются вместе с RATE_LIMIT_ENABLED
+    per_ip=settings.WS_MAX_CONNECTIONS_PER_IP if settings.RATE_LIMIT_ENABLED else None,
+)
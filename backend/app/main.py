@@ -1,18 +1,76 @@
+import json
+from typing import Optional
+
 from fastapi import Depends, FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from . import auth, deps
 from .config import settings
-from .database import init_db
-from .models import User
-from .realtime import manager
-from .routers import wishlists
+from .database import AsyncSessionLocal, dispose_engines, get_engine, init_engines, pool_limits
+from .events import RESYNC, snapshot_event
+from .hashing import password_hasher
+from .instrumentation import MetricsMiddleware, report_ready
+from .limits import (
+    WS_CONNECT,
+    WS_RESYNC,
+    AdmissionMiddleware,
+    TokenBucket,
+    client_ip,
+    rate_limiter,
+    ws_limiter,
+)
+from .metrics import REGISTRY
+from .pagination import NEXT_CURSOR_HEADER
+from .principals import Principal
+from .realtime import manager, scheduler
+from .rendering import render_wishlist
+from .replicas import ReadYourWritesMiddleware, lag_monitor
+from .schema import check_schema
+from .routers import me, wishlists
 from .schemas import UserOut
 
 
+# Код закрытия WebSocket для несуществующего вишлиста
+WS_CLOSE_NOT_FOUND = 4404
+# 1013 Try Again Later: превышен лимит подключений
+WS_CLOSE_TRY_AGAIN = 1013
+
+
+async def _snapshot_message(public_id: str) -> Optional[dict]:
+    async with AsyncSessionLocal() as db:
+        public = await render_wishlist(db, public_id=public_id)
+    return snapshot_event(public) if public is not None else None
+
+
+async def _send_snapshot(websocket: WebSocket, public_id: str) -> bool:
+    message = await _snapshot_message(public_id)
+    if message is None:
+        return False
+    await manager.send(public_id, websocket, message)
+    return True
+
+
+def _is_resync_request(message: str) -> bool:
+    try:
+        data = json.loads(message)
+    except ValueError:
+        return False
+    return isinstance(data, dict) and data.get("type") == RESYNC
+
+
 def create_app() -> FastAPI:
     app = FastAPI(title="Social Wishlist API")
 
+    # Не больше запросов в работе, чем соединений в пуле: лишние ждут
+    # недолго в очереди или сразу получают 503 (см. limits.py).
+    # Внутри CORS, чтобы у отказа были CORS-заголовки.
+    app.add_middleware(
+        AdmissionMiddleware,
+        max_concurrent=settings.MAX_CONCURRENT_REQUESTS or sum(pool_limits()),
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    )
     # CORS
     app.add_middleware(
         CORSMiddleware,
@@ -20,16 +78,63 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "Retry-After"],
     )
+    # Время запросов по маршрутам и SQL за запрос (см. instrumentation.py)
+    app.add_middleware(MetricsMiddleware)
+    if settings.REPLICA_DATABASE_URL:
+        # после записи пользователь какое-то время читает с основной базы
+        app.add_middleware(ReadYourWritesMiddleware)
+
+    # снапшоты для подписчиков, у которых переполнилась очередь
+    manager.snapshot_provider = _snapshot_message
 
-    # Инициализация БД при старте
+    # Движки создаются здесь, а не при импорте: под gunicorn это уже
+    # воркер после fork. Схему создают миграции (alembic upgrade head),
+    # здесь только проверка.
     @app.on_event("startup")
     def on_startup() -> None:
-        init_db()
+        init_engines()
+        check_schema(get_engine())
+
+    @app.on_event("startup")
+    async def start_lag_monitor() -> None:
+        await lag_monitor.start()
+
+    # Брокер realtime-рассылок между инстансами
+    @app.on_event("startup")
+    async def start_realtime() -> None:
+        await manager.start()
+
+    # последний обработчик startup: время холодного старта процесса
+    @app.on_event("startup")
+    def on_ready() -> None:
+        report_ready()
+
+    @app.on_event("shutdown")
+    async def stop_realtime() -> None:
+        await scheduler.stop()
+        await manager.stop()
+
+    @app.on_event("shutdown")
+    def stop_password_hasher() -> None:
+        password_hasher.shutdown()
+
+    @app.on_event("shutdown")
+    async def close_database() -> None:
+        await lag_monitor.stop()
+        await dispose_engines()
+
+    # Метрики в формате Prometheus
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
 
     # Роуты аутентификации
     @app.get("/auth/me", response_model=UserOut)
-    def read_me(current_user: User = Depends(deps.get_current_user)):
+    def read_me(current_user: Principal = Depends(deps.get_current_user)):
         return current_user
 
     app.include_router(auth.router)
@@ -37,16 +142,48 @@ def create_app() -> FastAPI:
     # Роуты вишлистов
     app.include_router(wishlists.router)
 
-    # WebSocket для realtime-обновлений по public_id списка
+    # Лента резервов и взносов пользователя
+    app.include_router(me.router)
+
+    # WebSocket для realtime-обновлений по public_id списка.
+    # Протокол сообщений описан в events.py.
     @app.websocket("/ws/wishlists/{public_id}")
-    async def wishlist_ws(websocket: WebSocket, public_id: str):
-        await manager.connect(public_id, websocket)
+    async def wishlist_ws(
+        websocket: WebSocket, public_id: str, last_seq: Optional[int] = None
+    ):
+        # лимиты проверяются до accept: отказ обходится без подписки и снапшота
+        ip = client_ip(websocket)
+        if await rate_limiter.hit(WS_CONNECT, "ip:" + ip) or not ws_limiter.acquire(public_id, ip):
+            await websocket.close(code=WS_CLOSE_TRY_AGAIN)
+            return
+        # resync — это рендер из БД, частые лишние запросы игнорируются
+        resyncs = TokenBucket(WS_RESYNC.rate, WS_RESYNC.burst)
         try:
+            # при переподключении с last_seq менеджер досылает пропущенные события
+            # из буфера; снапшот нужен, только если буфер не покрывает разрыв
+            replayed = await manager.connect(public_id, websocket, last_seq=last_seq)
+            # снапшот отправляем уже после подписки: дельты с seq <= seq снапшота
+            # клиент отбросит, так что между ними ничего не теряется
+            if not replayed and not await _send_snapshot(websocket, public_id):
+                manager.disconnect(public_id, websocket)
+                await websocket.close(code=WS_CLOSE_NOT_FOUND)
+                return
             while True:
-                # держим соединение открытым; клиент может посылать pings/noop
-                await websocket.receive_text()
+                # держим соединение открытым; клиент отвечает pong на ping,
+                # может посылать noop или {"type": "resync"}, если заметил
+                # разрыв в seq
+                message = await websocket.receive_text()
+                # любое сообщение (и ответ pong на ping) — признак жизни
+                manager.touch(public_id, websocket)
+                if _is_resync_request(message) and not resyncs.take():
+                    await _send_snapshot(websocket, public_id)
         except WebSocketDisconnect:
+            pass
+        finally:
+            # и при любой другой ошибке (receive после закрытия по heartbeat,
+            # сбой БД при resync): реестр и лимиты должны сойтись с реальностью
             manager.disconnect(public_id, websocket)
+            ws_limiter.release(public_id, ip)
 
     return app
 
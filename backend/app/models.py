@@ -1,13 +1,13 @@
 from datetime import date, datetime
-from decimal import Decimal
 
 from sqlalchemy import (
+    BigInteger,
     Column,
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
-    Numeric,
     String,
     Text,
     UniqueConstraint,
@@ -31,6 +31,10 @@ class User(Base):
 
 class Wishlist(Base):
     __tablename__ = "wishlists"
+    __table_args__ = (
+        # list_my_wishlists: WHERE owner_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_wishlists_owner_created", "owner_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     public_id = Column(String(64), unique=True, index=True, nullable=False)
@@ -39,6 +43,9 @@ class Wishlist(Base):
     description = Column(Text, nullable=True)
     event_date = Column(Date, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Номер последнего realtime-события по вишлисту (см. events.py).
+    # Увеличивается в транзакции записи, поэтому монотонен для всех инстансов.
+    event_seq = Column(Integer, nullable=False, default=0, server_default="0")
 
     owner = relationship("User", back_populates="wishlists")
     items = relationship("WishlistItem", back_populates="wishlist", cascade="all, delete-orphan")
@@ -46,15 +53,29 @@ class Wishlist(Base):
 
 class WishlistItem(Base):
     __tablename__ = "wishlist_items"
+    __table_args__ = (
+        # подарки вишлиста по порядку id (рендеринг и keyset-страницы)
+        Index("ix_wishlist_items_wishlist_id", "wishlist_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     wishlist_id = Column(Integer, ForeignKey("wishlists.id"), nullable=False)
     name = Column(String(255), nullable=False)
     url = Column(String(1024), nullable=True)
-    price = Column(Numeric(10, 2), nullable=False, default=Decimal("0.00"))
+    # деньги — целые копейки (см. money.py)
+    price_cents = Column(BigInteger, nullable=False, default=0)
     image_url = Column(String(1024), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # Денормализованные агрегаты по взносам и резерву. Обновляются в той же
+    # транзакции, что и contribute / toggle_reservation; пересчитать с нуля
+    # можно командой `python -m app.aggregates`.
+    total_contributed_cents = Column(
+        BigInteger, nullable=False, default=0, server_default="0"
+    )
+    contributors_count = Column(Integer, nullable=False, default=0, server_default="0")
+    reserved_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
     wishlist = relationship("Wishlist", back_populates="items")
     reservations = relationship(
         "Reservation", back_populates="item", cascade="all, delete-orphan"
@@ -73,6 +94,8 @@ class Reservation(Base):
     __tablename__ = "reservations"
     __table_args__ = (
         UniqueConstraint("item_id", name="uq_reservation_item"),
+        # лента /me/activity (activity.py)
+        Index("ix_reservations_user_activity", "user_id", "created_at", "id"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -87,15 +110,21 @@ class Reservation(Base):
 class Contribution(Base):
     """
     Вклад в дорогой подарок.
-    Несколько друзей могут скидываться, у каждого свой amount.
+    Несколько друзей могут скидываться, у каждого свой amount_cents.
     """
 
     __tablename__ = "contributions"
+    __table_args__ = (
+        # взносы зрителя в подарок и пересчёт агрегатов
+        Index("ix_contributions_item_user", "item_id", "user_id"),
+        # взносы пользователя, новые сверху: лента /me/activity (activity.py)
+        Index("ix_contributions_user_activity", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     item_id = Column(Integer, ForeignKey("wishlist_items.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    amount = Column(Numeric(10, 2), nullable=False)
+    amount_cents = Column(BigInteger, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     item = relationship("WishlistItem", back_populates="contributions")
@@ -0,0 +1,26 @@
+"""
+Деньги внутри бэкенда — целые копейки (BIGINT в БД, int в Python):
+суммы, сравнения и агрегаты в SQL и в коде идут над целыми числами.
+На входе API рубли приходят Decimal из схем, на выходе отдаются
+те же целые копейки (поля *_cents). Рубли float (from_cents) остались
+только в устаревших полях для старых клиентов.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+CENTS_PER_UNIT = 100
+# предел BIGINT
+MAX_CENTS = 2**63 - 1
+
+
+def to_cents(amount: Decimal) -> int:
+    """Рубли -> копейки, лишние знаки округляются до копейки."""
+    scaled = amount * CENTS_PER_UNIT
+    if abs(scaled) > MAX_CENTS:
+        raise ValueError("Слишком большая сумма")
+    return int(scaled.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    """Копейки -> рубли float для устаревших полей; то же число, что давал float(Decimal)."""
+    return cents / CENTS_PER_UNIT
@@ -0,0 +1,56 @@
+"""
+Keyset-пагинация с непрозрачным курсором.
+
+Курсор — base64url от JSON-списка значений ключа сортировки последней
+отданной строки, например [created_at, id] или [id]. Следующая страница
+читается условием «строго после ключа», без OFFSET, поэтому стоимость
+запроса не растёт с номером страницы, а вставки не сдвигают страницы.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Sequence
+
+from fastapi import HTTPException
+
+# Заголовок ответа с курсором следующей страницы (нет заголовка — страниц больше нет)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> tuple:
+    """
+    Разбирает курсор в кортеж значений заданных типов (int, str, datetime).
+    Битый или чужой курсор — 400.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        decoded = []
+        for value, type_ in zip(values, types):
+            if type_ is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            else:
+                if not isinstance(value, type_) or isinstance(value, bool):
+                    raise ValueError(cursor)
+                decoded.append(value)
+        return tuple(decoded)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
@@ -0,0 +1,101 @@
+"""
+Кэш аутентификации: токен -> id пользователя и id -> Principal.
+
+Principal — лёгкий снимок пользователя без ORM-объекта и сессии.
+Обработчикам, которым нужен только id, достаточно Principal из токена
+(см. deps.get_current_principal) — без запроса в users вообще.
+
+Кэш локален для процесса: изменения пользователя через ORM и logout
+сбрасывают записи сразу, в соседних процессах — по истечении TTL.
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+from sqlalchemy import event
+
+from .config import settings
+from .models import User
+
+V = TypeVar("V")
+
+
+class Principal:
+    """Аутентифицированный пользователь. Без email/name в режиме «только id»."""
+
+    __slots__ = ("id", "email", "name", "created_at")
+
+    def __init__(
+        self,
+        id: int,
+        email: Optional[str] = None,
+        name: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+    ) -> None:
+        self.id = id
+        self.email = email
+        self.name = name
+        self.created_at = created_at
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, email=user.email, name=user.name, created_at=user.created_at)
+
+
+class TTLCache(Generic[V]):
+    """LRU с ограничением размера и временем жизни записей."""
+
+    def __init__(self, *, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+# access token -> id пользователя (экономит проверку подписи JWT)
+token_cache: "TTLCache[int]" = TTLCache(
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS, max_size=settings.PRINCIPAL_CACHE_MAX_SIZE
+)
+# id пользователя -> Principal (экономит SELECT из users)
+principal_cache: "TTLCache[Principal]" = TTLCache(
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS, max_size=settings.PRINCIPAL_CACHE_MAX_SIZE
+)
+
+
+def invalidate_user(user_id: int) -> None:
+    principal_cache.pop(user_id)
+
+
+def invalidate_token(token: str) -> None:
+    token_cache.pop(token)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _on_user_change(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
@@ -1,40 +1,610 @@
-from typing import Dict, List
+import asyncio
+import itertools
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
 
 from fastapi import WebSocket
 
+from . import metrics
+from .broker import Broker, InMemoryBroker, make_broker
+from .config import settings
+from .events import PING, coalesce_events
+from .serialization import dumps
+
+# Политики для клиента, который не успевает читать сообщения
+SLOW_CONSUMER_DROP_OLDEST = "drop_oldest"
+SLOW_CONSUMER_COALESCE = "coalesce"
+SLOW_CONSUMER_DISCONNECT = "disconnect"
+SLOW_CONSUMER_POLICIES = (
+    SLOW_CONSUMER_DROP_OLDEST,
+    SLOW_CONSUMER_COALESCE,
+    SLOW_CONSUMER_DISCONNECT,
+)
+
+# 1013 Try Again Later: клиент не успевал читать и был отключён
+WS_CLOSE_SLOW_CONSUMER = 1013
+# клиент не отвечал на heartbeat (по аналогии с HTTP 408)
+WS_CLOSE_HEARTBEAT_TIMEOUT = 4408
+# 1011 Internal Error: не удалось отправить сообщение (или собрать снапшот)
+WS_CLOSE_SEND_FAILED = 1011
+
+# Маркер в очереди: вместо накопленных сообщений отправить свежий снапшот
+_SNAPSHOT = object()
+
+SnapshotProvider = Callable[[str], Awaitable[Optional[dict]]]
+
+WS_CONNECTIONS = metrics.gauge(
+    "ws_connections", "Открытые WebSocket-подключения этого процесса", ("wishlist",)
+)
+FANOUT_SECONDS = metrics.histogram(
+    "realtime_fanout_seconds",
+    "Раскладка сообщения по очередям подписчиков вишлиста",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5),
+)
+PUBLISH_SECONDS = metrics.histogram(
+    "realtime_publish_seconds", "Публикация сообщения в брокер"
+)
+HEARTBEAT_SWEEP_SECONDS = metrics.histogram(
+    "realtime_heartbeat_sweep_seconds",
+    "Обход всех сокетов процесса: ping молчащим, закрытие не ответивших",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+WS_REAPED = metrics.counter(
+    "ws_connections_reaped_total", "Сокеты, закрытые из-за молчания дольше heartbeat_timeout"
+)
+
+# Канал брокера для вишлиста
+CHANNEL_PREFIX = "wishlist_"
+# Сколько последних id сообщений помнить для дедупликации
+_SEEN_IDS_LIMIT = 10_000
+# Через сколько сокетов обход heartbeat отдаёт управление event loop
+_SWEEP_BATCH = 1000
+
+
+def encode_message(message: dict) -> str:
+    return dumps(message).decode()
+
+
+class _Connection:
+    """
+    Сокет и его исходящие сообщения. Очередь и задача-писатель появляются
+    с первым сообщением; отправив всё, писатель ждёт следующего на wakeup
+    и завершается, если writer_idle секунд ничего не приходило. Тихий
+    сокет — это несколько слотов этого объекта.
+    """
+
+    __slots__ = (
+        "websocket", "pending", "writer", "wakeup", "parked_at", "idle_timer", "last_seen"
+    )
+
+    def __init__(self, websocket: WebSocket, now: float) -> None:
+        self.websocket = websocket
+        self.pending: Optional[Deque[object]] = None
+        self.writer: Optional[asyncio.Task] = None
+        # future, на котором ждёт писатель без сообщений: True — есть
+        # что отправить, False — простоял writer_idle секунд
+        self.wakeup: Optional[asyncio.Future] = None
+        # когда писатель последний раз остался без сообщений; таймер
+        # простоя взводится один раз и сверяется с parked_at, когда сработает
+        self.parked_at = 0.0
+        self.idle_timer: Optional[asyncio.TimerHandle] = None
+        # когда от клиента последний раз что-то приходило (loop.time())
+        self.last_seen = now
+
+
+class _ReplayBuffer:
+    """
+    Последние события вишлиста (from_seq, seq, закодированное сообщение)
+    для переподключившихся клиентов. Ограничен числом событий и байтами.
+    У одиночного события from_seq == seq, у пачки items_changed — начало серии.
+    """
+
+    __slots__ = ("events", "size", "max_events", "max_bytes")
+
+    def __init__(self, max_events: int, max_bytes: int) -> None:
+        self.events: Deque[Tuple[int, int, str]] = deque()
+        self.size = 0
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+
+    def append(self, from_seq: int, seq: int, data: str) -> None:
+        if self.events and seq <= self.events[-1][1]:
+            # событие пришло не по порядку (другой инстанс, гонка коммитов)
+            if any(s == seq for _, s, _ in self.events):
+                return
+            index = next(i for i, (_, s, _) in enumerate(self.events) if s > seq)
+            self.events.insert(index, (from_seq, seq, data))
+        else:
+            self.events.append((from_seq, seq, data))
+        self.size += len(data)
+        while self.events and (
+            len(self.events) > self.max_events or self.size > self.max_bytes
+        ):
+            _, _, dropped = self.events.popleft()
+            self.size -= len(dropped)
+
+    def since(self, last_seq: int) -> Optional[List[str]]:
+        """
+        События после last_seq или None, если буфер не покрывает разрыв.
+        """
+        if not self.events or self.events[-1][1] < last_seq:
+            return None
+        expected = last_seq + 1
+        missed = []
+        for from_seq, seq, data in self.events:
+            if seq < expected:
+                continue
+            if from_seq > expected:
+                return None
+            missed.append(data)
+            expected = seq + 1
+        return missed
+
+    def reset(self) -> None:
+        self.events.clear()
+        self.size = 0
+
 
 class WishlistConnectionManager:
     """
-    Простой in-memory менеджер WebSocket-подключений по public_id вишлиста.
-    Подходит для одного инстанса приложения (демо / тестовое задание).
+    Менеджер WebSocket-подключений по public_id вишлиста.
+
+    Рассылка не ждёт клиентов: сообщение кодируется один раз и кладётся
+    в ограниченные очереди подключений, которые разбирают их собственные
+    задачи-писатели. Медленный клиент не задерживает остальных; при
+    переполнении его очереди срабатывает slow_consumer_policy. Писатель
+    живёт, пока сокету что-то шлют, и ещё writer_idle секунд после:
+    рассылка в активный вишлист не создаёт задач.
+
+    Между инстансами сообщения ходят через брокер (broker.py): процесс
+    подписан на каналы только тех вишлистов, у которых есть его сокеты.
+    Своим сокетам сообщение доставляется сразу, эхо от брокера и повторы
+    отбрасываются по id сообщения.
+
+    Для каждого вишлиста с подписчиками хранится буфер последних событий:
+    клиент, переподключившийся с last_seq, получает только пропущенное.
+    Буфер и подписка живут ещё replay_linger секунд после ухода последнего
+    сокета, чтобы пережить переподключения мобильных клиентов.
+
+    Heartbeat: раз в heartbeat_interval секунд менеджер обходит сокеты.
+    Тем, от кого ничего не приходило heartbeat_interval, уходит ping;
+    молчащие дольше heartbeat_timeout (мёртвые и полуоткрытые соединения)
+    закрываются. Так сокет закрывается не позже чем через
+    heartbeat_timeout + heartbeat_interval после последнего ответа.
     """
 
-    def __init__(self) -> None:
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    def __init__(
+        self,
+        *,
+        queue_size: int = 64,
+        slow_consumer_policy: str = SLOW_CONSUMER_COALESCE,
+        writer_idle: float = 10.0,
+        broker: Optional[Broker] = None,
+        replay_max_events: int = 256,
+        replay_max_bytes: int = 256 * 1024,
+        replay_linger: float = 60.0,
+        heartbeat_interval: float = 0.0,
+        heartbeat_timeout: float = 0.0,
+    ) -> None:
+        if slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Неизвестная политика: {slow_consumer_policy}")
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.writer_idle = writer_idle
+        # Источник свежих снапшотов для политики coalesce (задаётся в main.py)
+        self.snapshot_provider: Optional[SnapshotProvider] = None
+        # Закодированный снапшот вишлиста (или его рендер в процессе),
+        # общий для всех переполненных очередей до следующего события
+        self._snapshots: Dict[str, asyncio.Future] = {}
+        self.active_connections: Dict[str, Dict[WebSocket, _Connection]] = {}
+
+        self.broker = broker or InMemoryBroker()
+        self._instance_id = secrets.token_hex(4)
+        self._message_ids = itertools.count(1)
+        self._seen_ids: "OrderedDict[str, None]" = OrderedDict()
+
+        self.replay_max_events = replay_max_events
+        self.replay_max_bytes = replay_max_bytes
+        self.replay_linger = replay_linger
+        self._replay: Dict[str, _ReplayBuffer] = {}
+        self._subscribed: Set[str] = set()
+        self._release_handles: Dict[str, asyncio.TimerHandle] = {}
 
-    async def connect(self, wishlist_public_id: str, websocket: WebSocket) -> None:
+        # 0 — без heartbeat
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._ping = encode_message({"type": PING})
+
+    async def start(self) -> None:
+        await self.broker.start(self._on_broker_message)
+        if self.heartbeat_interval > 0 and self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        await self.broker.stop()
+
+    async def connect(
+        self,
+        wishlist_public_id: str,
+        websocket: WebSocket,
+        last_seq: Optional[int] = None,
+    ) -> bool:
+        """
+        Подключает сокет. Если передан last_seq и буфер покрывает разрыв,
+        пропущенные события сразу ставятся в очередь и возвращается True;
+        иначе клиенту нужен снапшот.
+        """
         await websocket.accept()
-        self.active_connections.setdefault(wishlist_public_id, []).append(websocket)
+        connection = _Connection(websocket, asyncio.get_running_loop().time())
+        connections = self.active_connections.setdefault(wishlist_public_id, {})
+        connections[websocket] = connection
+        WS_CONNECTIONS.set(len(connections), wishlist=wishlist_public_id)
+
+        handle = self._release_handles.pop(wishlist_public_id, None)
+        if handle is not None:
+            handle.cancel()
+        buffer = self._replay.setdefault(
+            wishlist_public_id, _ReplayBuffer(self.replay_max_events, self.replay_max_bytes)
+        )
+        # повтор ставится в очередь до любого await, чтобы не перемешаться
+        # с новыми рассылками
+        missed = buffer.since(last_seq) if last_seq is not None else None
+        if missed is not None:
+            for data in missed:
+                self._enqueue(wishlist_public_id, connection, data)
+
+        if wishlist_public_id not in self._subscribed:
+            self._subscribed.add(wishlist_public_id)
+            await self.broker.subscribe(CHANNEL_PREFIX + wishlist_public_id)
+        return missed is not None
+
+    def touch(self, wishlist_public_id: str, websocket: WebSocket) -> None:
+        """Клиент прислал сообщение (любое, в том числе pong): он жив."""
+        connection = self.active_connections.get(wishlist_public_id, {}).get(websocket)
+        if connection is not None:
+            connection.last_seen = asyncio.get_running_loop().time()
 
     def disconnect(self, wishlist_public_id: str, websocket: WebSocket) -> None:
-        if wishlist_public_id in self.active_connections:
-            self.active_connections[wishlist_public_id] = [
-                ws for ws in self.active_connections[wishlist_public_id] if ws is not websocket
-            ]
-            if not self.active_connections[wishlist_public_id]:
-                self.active_connections.pop(wishlist_public_id, None)
+        connections = self.active_connections.get(wishlist_public_id)
+        if not connections:
+            return
+        connection = connections.pop(websocket, None)
+        if connections:
+            WS_CONNECTIONS.set(len(connections), wishlist=wishlist_public_id)
+        else:
+            WS_CONNECTIONS.remove(wishlist=wishlist_public_id)
+            self.active_connections.pop(wishlist_public_id, None)
+            self._schedule_release(wishlist_public_id)
+        if connection is not None and connection.writer is not None:
+            if connection.writer is not asyncio.current_task():
+                connection.writer.cancel()
 
     async def broadcast(self, wishlist_public_id: str, message: dict) -> None:
-        connections = self.active_connections.get(wishlist_public_id, [])
-        stale: List[WebSocket] = []
-        for websocket in connections:
-            try:
-                await websocket.send_json(message)
-            except Exception:
-                stale.append(websocket)
-        for websocket in stale:
+        data = encode_message(message)
+        seq = message.get("seq")
+        from_seq = message.get("from_seq", seq)
+        message_id = f"{self._instance_id}:{next(self._message_ids)}"
+        self._mark_seen(message_id)
+        self._remember(wishlist_public_id, from_seq, seq, data)
+        self._fanout(wishlist_public_id, data)
+
+        max_payload = self.broker.max_payload
+        if max_payload is not None and len(data.encode()) > max_payload:
+            # в брокер не влезает: соседние инстансы разошлют свежий снапшот
+            data = ""
+        seq_range = f"{from_seq}\n{seq}" if seq is not None else "\n"
+        header = f"{message_id}\n{seq_range}\n"
+        started = time.perf_counter()
+        await self.broker.publish(CHANNEL_PREFIX + wishlist_public_id, header + data)
+        PUBLISH_SECONDS.observe(time.perf_counter() - started)
+
+    def _fanout(self, wishlist_public_id: str, data: str) -> None:
+        # новое событие: снапшот, собранный до него, больше не свежий
+        self._snapshots.pop(wishlist_public_id, None)
+        connections = self.active_connections.get(wishlist_public_id)
+        if not connections:
+            return
+        started = time.perf_counter()
+        for connection in list(connections.values()):
+            self._enqueue(wishlist_public_id, connection, data)
+        FANOUT_SECONDS.observe(time.perf_counter() - started)
+
+    async def _on_broker_message(self, channel: str, payload: str) -> None:
+        # формат: "<id сообщения>\n<from_seq>\n<seq>\n<сообщение или пусто>",
+        # seq пустые у сообщений без номера
+        message_id, from_seq, seq, data = payload.split("\n", 3)
+        if message_id in self._seen_ids:
+            return
+        self._mark_seen(message_id)
+        wishlist_public_id = channel[len(CHANNEL_PREFIX):]
+        if seq:
+            self._remember(wishlist_public_id, int(from_seq), int(seq), data)
+        self._fanout(wishlist_public_id, data or _SNAPSHOT)
+
+    def _remember(
+        self, wishlist_public_id: str, from_seq: Optional[int], seq: Optional[int], data: str
+    ) -> None:
+        buffer = self._replay.get(wishlist_public_id)
+        if buffer is None or seq is None:
+            return
+        if data:
+            buffer.append(from_seq, seq, data)
+        else:
+            # содержимое события неизвестно: повторять нечего
+            buffer.reset()
+
+    def _mark_seen(self, message_id: str) -> None:
+        self._seen_ids[message_id] = None
+        if len(self._seen_ids) > _SEEN_IDS_LIMIT:
+            self._seen_ids.popitem(last=False)
+
+    def _schedule_release(self, wishlist_public_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        self._release_handles[wishlist_public_id] = loop.call_later(
+            self.replay_linger,
+            lambda: asyncio.create_task(self._release_if_idle(wishlist_public_id)),
+        )
+
+    async def _release_if_idle(self, wishlist_public_id: str) -> None:
+        self._release_handles.pop(wishlist_public_id, None)
+        if wishlist_public_id in self.active_connections:
+            return
+        self._replay.pop(wishlist_public_id, None)
+        self._snapshots.pop(wishlist_public_id, None)
+        if wishlist_public_id in self._subscribed:
+            self._subscribed.discard(wishlist_public_id)
+            await self.broker.unsubscribe(CHANNEL_PREFIX + wishlist_public_id)
+
+    async def send(self, wishlist_public_id: str, websocket: WebSocket, message: dict) -> None:
+        """Сообщение одному подписчику, в общем порядке с рассылками."""
+        connection = self.active_connections.get(wishlist_public_id, {}).get(websocket)
+        if connection is not None:
+            self._enqueue(wishlist_public_id, connection, encode_message(message))
+
+    def _enqueue(self, wishlist_public_id: str, connection: _Connection, item: object) -> None:
+        pending = connection.pending
+        if pending is None:
+            pending = connection.pending = deque()
+        if len(pending) < self.queue_size:
+            pending.append(item)
+        elif self.slow_consumer_policy == SLOW_CONSUMER_DROP_OLDEST:
+            # клиент увидит разрыв в seq и сам запросит resync
+            pending.popleft()
+            pending.append(item)
+        elif (
+            self.slow_consumer_policy == SLOW_CONSUMER_COALESCE
+            and self.snapshot_provider is not None
+        ):
+            # накопленные дельты заменяем одним свежим снапшотом
+            pending.clear()
+            pending.append(_SNAPSHOT)
+        else:
+            self.disconnect(wishlist_public_id, connection.websocket)
+            asyncio.create_task(self._close(connection.websocket, WS_CLOSE_SLOW_CONSUMER))
+            return
+        if connection.writer is None:
+            connection.writer = asyncio.create_task(
+                self._write_loop(wishlist_public_id, connection)
+            )
+        elif connection.wakeup is not None:
+            wakeup, connection.wakeup = connection.wakeup, None
+            # таймер простоя мог сработать, а писатель ещё не проснулся:
+            # тогда он сам увидит непустую очередь
+            if not wakeup.done():
+                wakeup.set_result(True)
+
+    async def _write_loop(self, wishlist_public_id: str, connection: _Connection) -> None:
+        loop = asyncio.get_running_loop()
+        websocket = connection.websocket
+        pending = connection.pending
+        try:
+            while True:
+                while pending:
+                    item = pending.popleft()
+                    if item is _SNAPSHOT:
+                        if self.snapshot_provider is None:
+                            continue
+                        item = await self._snapshot(wishlist_public_id)
+                        if item is None:
+                            continue
+                    await websocket.send_text(item)
+                wakeup = connection.wakeup = loop.create_future()
+                connection.parked_at = loop.time()
+                if connection.idle_timer is None:
+                    connection.idle_timer = loop.call_later(
+                        self.writer_idle, self._check_idle, connection
+                    )
+                await wakeup
+                connection.wakeup = None
+                if not pending:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # без закрытия клиент остался бы подключён, но вне реестра:
+            # без рассылок и без heartbeat
             self.disconnect(wishlist_public_id, websocket)
+            await self._close(websocket, WS_CLOSE_SEND_FAILED)
+            return
+        finally:
+            if connection.idle_timer is not None:
+                connection.idle_timer.cancel()
+                connection.idle_timer = None
+        # простоял writer_idle: следующее сообщение запустит нового писателя
+        connection.pending = None
+        connection.writer = None
+
+    async def _snapshot(self, wishlist_public_id: str) -> Optional[str]:
+        """
+        Свежий снапшот для политики coalesce. Когда переполняются очереди
+        многих подписчиков горячего вишлиста, рендер один на всех: писатели
+        ждут один и тот же future, пока не придёт следующее событие.
+        """
+        future = self._snapshots.get(wishlist_public_id)
+        if future is None or (
+            future.done() and (future.cancelled() or future.exception() is not None)
+        ):
+            future = self._snapshots[wishlist_public_id] = asyncio.ensure_future(
+                self._render_snapshot(wishlist_public_id)
+            )
+        # отключение одного подписчика не отменяет рендер для остальных
+        return await asyncio.shield(future)
+
+    async def _render_snapshot(self, wishlist_public_id: str) -> Optional[str]:
+        message = await self.snapshot_provider(wishlist_public_id)
+        return encode_message(message) if message is not None else None
+
+    def _check_idle(self, connection: _Connection) -> None:
+        """Таймер простоя: отпускает писателя или переносит проверку."""
+        connection.idle_timer = None
+        wakeup = connection.wakeup
+        if wakeup is None or wakeup.done():
+            # писатель занят: взведёт таймер заново, когда снова останется без сообщений
+            return
+        loop = asyncio.get_running_loop()
+        remaining = connection.parked_at + self.writer_idle - loop.time()
+        if remaining > 0:
+            connection.idle_timer = loop.call_later(remaining, self._check_idle, connection)
+        else:
+            wakeup.set_result(False)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            started = time.perf_counter()
+            await self.sweep()
+            HEARTBEAT_SWEEP_SECONDS.observe(time.perf_counter() - started)
+
+    async def sweep(self) -> None:
+        """
+        Один обход heartbeat. Обход идёт по снимку реестра и раз в
+        _SWEEP_BATCH сокетов отдаёт управление, чтобы на сотнях тысяч
+        сокетов не задерживать обработку запросов.
+        """
+        loop = asyncio.get_running_loop()
+        targets = [
+            (wishlist_public_id, connection)
+            for wishlist_public_id, connections in self.active_connections.items()
+            for connection in connections.values()
+        ]
+        for index, (wishlist_public_id, connection) in enumerate(targets, 1):
+            if index % _SWEEP_BATCH == 0:
+                await asyncio.sleep(0)
+            websocket = connection.websocket
+            connections = self.active_connections.get(wishlist_public_id)
+            if not connections or connections.get(websocket) is not connection:
+                # отключился, пока обход стоял на паузе
+                continue
+            silent = loop.time() - connection.last_seen
+            if silent >= self.heartbeat_timeout:
+                WS_REAPED.inc()
+                self.disconnect(wishlist_public_id, websocket)
+                asyncio.create_task(self._close(websocket, WS_CLOSE_HEARTBEAT_TIMEOUT))
+            elif silent >= self.heartbeat_interval:
+                self._enqueue(wishlist_public_id, connection, self._ping)
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int) -> None:
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class _PendingBroadcast:
+    __slots__ = ("messages", "first_at", "last_at")
+
+    def __init__(self, now: float) -> None:
+        self.messages: List[dict] = []
+        self.first_at = now
+        self.last_at = now
+
+
+class BroadcastScheduler:
+    """
+    Сглаживание всплесков записей в один вишлист.
+
+    Обработчик только отдаёт дельту и возвращается. Первая дельта вишлиста
+    запускает задачу рассылки, которая ждёт, пока поток записей не
+    стихнет на window секунд (но не дольше max_delay с первой дельты),
+    и публикует всё накопленное одним сообщением (events.coalesce_events).
+    На вишлист — не больше одной рассылки за окно, сколько бы записей
+    ни пришло. window = 0 — публиковать сразу, без склейки.
+    """
+
+    def __init__(
+        self,
+        connection_manager: WishlistConnectionManager,
+        *,
+        window: float,
+        max_delay: float,
+    ) -> None:
+        self.manager = connection_manager
+        self.window = window
+        self.max_delay = max(max_delay, window)
+        self._pending: Dict[str, _PendingBroadcast] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def publish(self, wishlist_public_id: str, message: dict) -> None:
+        if self.window <= 0:
+            await self.manager.broadcast(wishlist_public_id, message)
+            return
+        now = asyncio.get_running_loop().time()
+        pending = self._pending.get(wishlist_public_id)
+        if pending is None:
+            pending = self._pending[wishlist_public_id] = _PendingBroadcast(now)
+            self._tasks[wishlist_public_id] = asyncio.create_task(
+                self._flush_later(wishlist_public_id, pending)
+            )
+        pending.messages.append(message)
+        pending.last_at = now
+
+    async def _flush_later(self, wishlist_public_id: str, pending: _PendingBroadcast) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            deadline = min(pending.last_at + self.window, pending.first_at + self.max_delay)
+            delay = deadline - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        await self._flush(wishlist_public_id)
+
+    async def _flush(self, wishlist_public_id: str) -> None:
+        pending = self._pending.pop(wishlist_public_id, None)
+        self._tasks.pop(wishlist_public_id, None)
+        if pending is None:
+            return
+        for message in coalesce_events(pending.messages):
+            await self.manager.broadcast(wishlist_public_id, message)
+
+    async def stop(self) -> None:
+        """Отменяет ожидание и сразу публикует накопленное."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        for wishlist_public_id in list(self._pending):
+            await self._flush(wishlist_public_id)
 
 
-manager = WishlistConnectionManager()
+manager = WishlistConnectionManager(
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    slow_consumer_policy=settings.WS_SLOW_CONSUMER_POLICY,
+    writer_idle=settings.WS_WRITER_IDLE_SECONDS,
+    broker=make_broker(),
+    replay_max_events=settings.WS_REPLAY_MAX_EVENTS,
+    replay_max_bytes=settings.WS_REPLAY_MAX_BYTES,
+    replay_linger=settings.WS_REPLAY_LINGER_SECONDS,
+    heartbeat_interval=settings.WS_HEARTBEAT_INTERVAL_SECONDS,
+    heartbeat_timeout=settings.WS_HEARTBEAT_TIMEOUT_SECONDS,
+)
 
+scheduler = BroadcastScheduler(
+    manager,
+    window=settings.WS_COALESCE_WINDOW_SECONDS,
+    max_delay=settings.WS_COALESCE_MAX_DELAY_SECONDS,
+)
@@ -0,0 +1,204 @@
+"""
+Сборка WishlistPublicOut прямо из SQL.
+
+Вишлист, его подарки и суммы взносов зрителя читаются одним
+сгруппированным запросом: строка на подарок, без ORM-объектов
+Contribution/Reservation и без декартова произведения joinedload.
+
+Модели собираются через construct() — без валидации, которую уже
+прошли данные при записи; кодируются они через serialization.dumps.
+"""
+
+from typing import Optional
+
+from sqlalchemy import BigInteger, and_, cast, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Contribution, Wishlist, WishlistItem
+from .money import from_cents
+from .schemas import WishlistItemPublic, WishlistPublicOut
+
+
+def build_wishlist_query(
+    *,
+    wishlist_id: Optional[int] = None,
+    public_id: Optional[str] = None,
+    viewer_id: Optional[int] = None,
+    after_item_id: Optional[int] = None,
+    limit: Optional[int] = None,
+):
+    """
+    SELECT вишлиста с подарками: wishlists LEFT JOIN wishlist_items
+    (LEFT JOIN взносы зрителя) GROUP BY подарок.
+
+    Агрегаты по всем взносам уже денормализованы в wishlist_items,
+    поэтому к contributions присоединяются только строки самого зрителя.
+
+    after_item_id/limit — keyset-страница подарков по id. Условие стоит
+    в ON, а не в WHERE: за последней страницей остаётся одна пустая
+    строка с шапкой вишлиста, и «не найден» отличается от «подарки кончились».
+    """
+    item_join = WishlistItem.wishlist_id == Wishlist.id
+    if after_item_id is not None:
+        item_join = and_(item_join, WishlistItem.id > after_item_id)
+
+    if viewer_id is not None:
+        # sum(bigint) в Postgres — numeric, возвращаем к целым копейкам
+        your_contribution = cast(func.coalesce(func.sum(Contribution.amount_cents), 0), BigInteger)
+    else:
+        your_contribution = literal(0)
+
+    stmt = select(
+        Wishlist.id,
+        Wishlist.public_id,
+        Wishlist.owner_id,
+        Wishlist.title,
+        Wishlist.description,
+        Wishlist.event_date,
+        Wishlist.created_at,
+        Wishlist.event_seq,
+        WishlistItem.id.label("item_id"),
+        WishlistItem.name,
+        WishlistItem.url,
+        WishlistItem.price_cents,
+        WishlistItem.image_url,
+        WishlistItem.total_contributed_cents,
+        WishlistItem.reserved_by_id,
+        your_contribution.label("your_contribution_cents"),
+    ).select_from(Wishlist).outerjoin(WishlistItem, item_join)
+
+    if viewer_id is not None:
+        stmt = stmt.outerjoin(
+            Contribution,
+            and_(Contribution.item_id == WishlistItem.id, Contribution.user_id == viewer_id),
+        ).group_by(Wishlist.id, WishlistItem.id)
+
+    if wishlist_id is not None:
+        stmt = stmt.where(Wishlist.id == wishlist_id)
+    if public_id is not None:
+        stmt = stmt.where(Wishlist.public_id == public_id)
+    stmt = stmt.order_by(WishlistItem.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _item_public(
+    source,
+    *,
+    item_id: int,
+    viewer_id: Optional[int],
+    your_contribution_cents: Optional[int],
+) -> WishlistItemPublic:
+    # данные из нашей же БД: construct() без повторной валидации;
+    # суммы — копейки, рубли — только в устаревших полях
+    your_contribution_cents = your_contribution_cents or 0
+    return WishlistItemPublic.construct(
+        id=item_id,
+        name=source.name,
+        url=source.url,
+        price_cents=source.price_cents,
+        image_url=source.image_url,
+        total_contributed_cents=source.total_contributed_cents,
+        is_fully_funded=source.total_contributed_cents >= source.price_cents,
+        has_reservation=source.reserved_by_id is not None,
+        you_reserved=viewer_id is not None and source.reserved_by_id == viewer_id,
+        your_contribution_cents=your_contribution_cents,
+        price=from_cents(source.price_cents),
+        total_contributed=from_cents(source.total_contributed_cents),
+        your_contribution=from_cents(your_contribution_cents),
+    )
+
+
+# Колонки подарка для RETURNING, из которых item_public собирает карточку
+ITEM_COLUMNS = (
+    WishlistItem.id,
+    WishlistItem.name,
+    WishlistItem.url,
+    WishlistItem.price_cents,
+    WishlistItem.image_url,
+    WishlistItem.total_contributed_cents,
+    WishlistItem.reserved_by_id,
+)
+
+
+def item_public(
+    item,
+    *,
+    viewer_id: Optional[int] = None,
+    your_contribution_cents: Optional[int] = None,
+) -> WishlistItemPublic:
+    """
+    Карточка подарка из уже загруженного ORM-объекта или строки RETURNING
+    с колонками ITEM_COLUMNS. Без viewer_id — обезличенная.
+    """
+    return _item_public(
+        item,
+        item_id=item.id,
+        viewer_id=viewer_id,
+        your_contribution_cents=your_contribution_cents,
+    )
+
+
+async def viewer_contribution(db: AsyncSession, item_id: int, viewer_id: int) -> int:
+    """Сумма взносов зрителя в подарок в копейках (для you_* после записи)."""
+    return await db.scalar(
+        select(
+            cast(func.coalesce(func.sum(Contribution.amount_cents), 0), BigInteger)
+        ).where(Contribution.item_id == item_id, Contribution.user_id == viewer_id)
+    )
+
+
+async def render_wishlist(
+    db: AsyncSession,
+    *,
+    wishlist_id: Optional[int] = None,
+    public_id: Optional[str] = None,
+    viewer_id: Optional[int] = None,
+    after_item_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> Optional[WishlistPublicOut]:
+    """
+    Публичное (или персональное, если передан viewer_id) представление
+    вишлиста. None, если вишлист не найден.
+
+    С after_item_id/limit в items попадает только страница подарков
+    с id > after_item_id, не больше limit штук.
+    """
+    result = await db.execute(
+        build_wishlist_query(
+            wishlist_id=wishlist_id,
+            public_id=public_id,
+            viewer_id=viewer_id,
+            after_item_id=after_item_id,
+            limit=limit,
+        )
+    )
+    rows = result.all()
+    if not rows:
+        return None
+
+    head = rows[0]
+    items = [
+        _item_public(
+            row,
+            item_id=row.item_id,
+            viewer_id=viewer_id,
+            your_contribution_cents=row.your_contribution_cents,
+        )
+        for row in rows
+        # вишлист без подарков: outer join вернул одну пустую строку
+        if row.item_id is not None
+    ]
+
+    return WishlistPublicOut.construct(
+        id=head.id,
+        public_id=head.public_id,
+        title=head.title,
+        description=head.description,
+        event_date=head.event_date,
+        created_at=head.created_at,
+        is_owner=viewer_id is not None and head.owner_id == viewer_id,
+        seq=head.event_seq,
+        items=items,
+    )
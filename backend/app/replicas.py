@@ -0,0 +1,154 @@
+"""
+Чтение с реплики.
+
+Зависимость get_async_read_db отдаёт сессию реплики тем, кому можно
+прочитать чуть устаревшие данные: публичные страницы, списки
+пользователя. Записи (reserve, contribute и прочие) остаются на основной
+базе через get_async_db.
+
+Основная база вместо реплики берётся, когда:
+- REPLICA_DATABASE_URL не задан;
+- реплика отстаёт больше REPLICA_MAX_LAG_SECONDS или не отвечает
+  (ReplicaLagMonitor проверяет раз в REPLICA_LAG_CHECK_SECONDS);
+- пользователь недавно писал: после успешного небезопасного запроса
+  ReadYourWritesMiddleware ставит cookie на время допустимого отставания,
+  и пока она жива, он видит свои записи. Cookie работает одинаково
+  на всех воркерах и инстансах.
+"""
+
+import asyncio
+import logging
+import math
+from typing import AsyncIterator, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.datastructures import MutableHeaders
+
+from . import metrics
+from .config import settings
+from .database import (
+    AsyncReplicaSessionLocal,
+    AsyncSessionLocal,
+    get_replica_engine,
+    init_engines,
+)
+
+logger = logging.getLogger(__name__)
+
+READ_PRIMARY_COOKIE = "read_primary"
+_SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Отставание по времени последней применённой транзакции. Если реплика
+# применила всё полученное, она не отстаёт, даже когда записей давно не было.
+_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+REPLICA_LAG_SECONDS = metrics.gauge(
+    "db_replica_lag_seconds", "Отставание реплики; -1 — реплика не отвечает"
+)
+READS = metrics.counter("db_reads_total", "Чтения через get_async_read_db", ("target",))
+
+
+class ReplicaLagMonitor:
+    """Периодически измеряет отставание реплики."""
+
+    def __init__(self, *, interval: float, max_lag: float) -> None:
+        self.interval = interval
+        self.max_lag = max_lag
+        # None — ещё не измеряли или реплика не ответила
+        self.lag: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.lag is not None and self.lag <= self.max_lag
+
+    async def start(self) -> None:
+        if get_replica_engine() is None or self._task is not None:
+            return
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def check(self) -> Optional[float]:
+        engine = get_replica_engine()
+        try:
+            if engine.dialect.name == "postgresql":
+                async with engine.connect() as conn:
+                    self.lag = float(await conn.scalar(_LAG_SQL))
+            else:
+                # отставание умеем измерять только у Postgres
+                self.lag = 0.0
+        except Exception:
+            if self.lag is not None or self._task is None:
+                logger.exception("Реплика не отвечает, чтение идёт с основной базы")
+            self.lag = None
+        REPLICA_LAG_SECONDS.set(-1 if self.lag is None else self.lag)
+        return self.lag
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+
+lag_monitor = ReplicaLagMonitor(
+    interval=settings.REPLICA_LAG_CHECK_SECONDS, max_lag=settings.REPLICA_MAX_LAG_SECONDS
+)
+
+
+def read_sessionmaker(request: Request) -> async_sessionmaker:
+    """Фабрика сессий для чтения в этом запросе: реплика или основная база."""
+    init_engines()
+    if lag_monitor.healthy and READ_PRIMARY_COOKIE not in request.cookies:
+        READS.inc(target="replica")
+        return AsyncReplicaSessionLocal
+    READS.inc(target="primary")
+    return AsyncSessionLocal
+
+
+async def get_async_read_db(
+    sessionmaker: async_sessionmaker = Depends(read_sessionmaker),
+) -> AsyncIterator[AsyncSession]:
+    async with sessionmaker() as db:
+        yield db
+
+
+def is_replica(db: AsyncSession) -> bool:
+    replica = get_replica_engine()
+    return replica is not None and db.bind is replica
+
+
+class ReadYourWritesMiddleware:
+    """
+    После успешной записи ставит cookie READ_PRIMARY_COOKIE: пока реплика
+    может не догнать эту запись, чтения пользователя идут на основную базу.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        # отставание не больше max_lag, но узнаём о нём с задержкой до interval
+        max_age = math.ceil(settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_LAG_CHECK_SECONDS)
+        self.cookie = (
+            f"{READ_PRIMARY_COOKIE}=1; Max-Age={max_age}; Path=/; HttpOnly; SameSite=lax"
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] in _SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                MutableHeaders(scope=message).append("set-cookie", self.cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import deps
+from ..activity import load_activity
+from ..pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+)
+from ..principals import Principal
+from ..replicas import get_async_read_db
+from ..schemas import ActivityEntry
+from ..serialization import ORJSONResponse
+
+router = APIRouter(prefix="/me", tags=["me"], default_response_class=ORJSONResponse)
+
+
+@router.get("/activity", response_model=List[ActivityEntry])
+async def read_my_activity(
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(deps.get_current_principal),
+) -> ORJSONResponse:
+    """
+    Резервы и взносы пользователя по всем вишлистам, новые сверху,
+    с карточками подарков и вишлистами. Курсор следующей страницы —
+    в заголовке X-Next-Cursor.
+    """
+    after = decode_cursor(cursor, (datetime, str, int)) if cursor is not None else None
+    # одна лишняя запись говорит, есть ли следующая страница
+    entries = await load_activity(db, current_user.id, after=after, limit=limit + 1)
+    headers = {}
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.kind, last.id)
+    return ORJSONResponse(entries, headers=headers)
@@ -1,14 +1,39 @@
-from decimal import Decimal
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, List, NoReturn, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, case, delete, exists, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import joinedload
 
 from .. import deps
-from ..database import get_db
-from ..models import Contribution, Reservation, User, Wishlist, WishlistItem
-from ..realtime import manager
+from ..bulk_import import parse_items, read_body
+from ..cache import etag_matches, matches_any_etag, snapshot_cache
+from ..config import settings
+from ..database import get_async_db
+from ..events import (
+    item_added_event,
+    item_funding_changed_event,
+    item_reservation_changed_event,
+    items_added_event,
+)
+from ..limits import ADD_ITEMS, CONTRIBUTE, CREATE_WISHLIST, RESERVE
+from ..models import Contribution, Reservation, Wishlist, WishlistItem
+from ..money import to_cents
+from ..pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+)
+from ..principals import Principal
+from ..realtime import scheduler
+from ..rendering import ITEM_COLUMNS, item_public, render_wishlist, viewer_contribution
+from ..replicas import get_async_read_db, is_replica, read_sessionmaker
 from ..schemas import (
+    BulkItemsResult,
     ContributionCreate,
     WishlistCreate,
     WishlistItemCreate,
@@ -16,127 +41,151 @@ from ..schemas import (
     WishlistPublicOut,
     WishlistSummary,
 )
+from ..serialization import ORJSONResponse, dumps
 
-router = APIRouter(prefix="/wishlists", tags=["wishlists"])
-
-
-def _build_item_public_dto(
-    item: WishlistItem,
-    *,
-    current_user: Optional[User],
-) -> WishlistItemPublic:
-    total_contributed = sum((c.amount for c in item.contributions), Decimal("0.00"))
-    has_reservation = bool(item.reservations)
-
-    you_reserved = False
-    your_contribution = Decimal("0.00")
-
-    if current_user:
-        for r in item.reservations:
-            if r.user_id == current_user.id:
-                you_reserved = True
-                break
-        your_contribution = sum(
-            (c.amount for c in item.contributions if c.user_id == current_user.id),
-            Decimal("0.00"),
-        )
-
-    is_fully_funded = total_contributed >= item.price
-
-    return WishlistItemPublic(
-        id=item.id,
-        name=item.name,
-        url=item.url,
-        price=item.price,
-        image_url=item.image_url,
-        total_contributed=total_contributed,
-        is_fully_funded=is_fully_funded,
-        has_reservation=has_reservation,
-        you_reserved=you_reserved,
-        your_contribution=your_contribution,
-    )
-
+router = APIRouter(
+    prefix="/wishlists", tags=["wishlists"], default_response_class=ORJSONResponse
+)
 
-def _wishlist_to_public_out(
-    wishlist: Wishlist,
-    *,
-    current_user: Optional[User],
-) -> WishlistPublicOut:
-    items = [
-        _build_item_public_dto(item, current_user=current_user)
-        for item in sorted(wishlist.items, key=lambda i: i.id)
-    ]
-    is_owner = current_user is not None and wishlist.owner_id == current_user.id
-    return WishlistPublicOut(
-        id=wishlist.id,
-        public_id=wishlist.public_id,
-        title=wishlist.title,
-        description=wishlist.description,
-        event_date=wishlist.event_date,
-        created_at=wishlist.created_at,
-        is_owner=is_owner,
-        items=items,
-    )
+# Что возвращают записи: только изменённый подарок или весь вишлист
+INCLUDE_ITEM = "item"
+INCLUDE_WISHLIST = "wishlist"
+IncludeQuery = Query(default=INCLUDE_WISHLIST, regex=f"^({INCLUDE_ITEM}|{INCLUDE_WISHLIST})$")
+# Подарок раньше вишлиста: Union проверяется по порядку
+WriteResult = Union[WishlistItemPublic, WishlistPublicOut]
 
 
-def _generate_public_id(db: Session) -> str:
+async def _generate_public_id(db: AsyncSession) -> str:
     import secrets
 
     while True:
         token = secrets.token_urlsafe(10)
-        exists = db.query(Wishlist).filter(Wishlist.public_id == token).first()
+        exists = await db.scalar(select(Wishlist.id).where(Wishlist.public_id == token))
         if not exists:
             return token
 
 
-def _load_wishlist_with_items(db: Session, wishlist_id: int) -> Wishlist:
-    wishlist = (
-        db.query(Wishlist)
-        .options(
-            joinedload(Wishlist.items)
-            .joinedload(WishlistItem.contributions),
-            joinedload(Wishlist.items)
-            .joinedload(WishlistItem.reservations),
-        )
-        .filter(Wishlist.id == wishlist_id)
-        .first()
+async def _render_wishlist(
+    db: AsyncSession,
+    wishlist_id: int,
+    current_user: Optional[Principal],
+) -> WishlistPublicOut:
+    public = await render_wishlist(
+        db,
+        wishlist_id=wishlist_id,
+        viewer_id=current_user.id if current_user else None,
     )
+    if public is None:
+        raise HTTPException(status_code=404, detail="Вишлист не найден")
+    return public
+
+
+async def _bump_event_seq(db: AsyncSession, wishlist_id: int):
+    """
+    Номер realtime-события для текущей записи. Выдаётся в той же транзакции,
+    поэтому порядок seq совпадает с порядком коммитов.
+    Возвращает строку (event_seq, public_id).
+    """
+    result = await db.execute(
+        update(Wishlist)
+        .where(Wishlist.id == wishlist_id)
+        .values(event_seq=Wishlist.event_seq + 1)
+        .returning(Wishlist.event_seq, Wishlist.public_id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.one()
+
+
+async def _write_result(
+    db: AsyncSession,
+    include: str,
+    wishlist_id: int,
+    current_user: Principal,
+    item: WishlistItemPublic,
+) -> ORJSONResponse:
+    """
+    Ответ записи. include=item — только карточка изменённого подарка,
+    собранная из RETURNING, без перечитывания вишлиста: время ответа
+    не зависит от числа подарков.
+
+    Модели собраны construct() из наших же данных, поэтому уходят готовым
+    ORJSONResponse, мимо повторной проверки по response_model.
+    """
+    if include == INCLUDE_ITEM:
+        return ORJSONResponse(item)
+    return ORJSONResponse(await _render_wishlist(db, wishlist_id, current_user))
+
+
+async def _get_own_wishlist(
+    db: AsyncSession, wishlist_id: int, current_user: Principal
+) -> Wishlist:
+    wishlist = await db.get(Wishlist, wishlist_id)
     if not wishlist:
         raise HTTPException(status_code=404, detail="Вишлист не найден")
+    if wishlist.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Можно редактировать только свои списки")
     return wishlist
 
 
-async def _broadcast_wishlist(db_wishlist: Wishlist) -> None:
-    # В websocket-сообщение отправляем обезличенное представление (без you_*),
-    # чтобы не раскрывать индивидуальную информацию. Клиент может обновить себя по HTTP.
-    public = _wishlist_to_public_out(db_wishlist, current_user=None)
-    await manager.broadcast(
-        db_wishlist.public_id,
-        {"type": "wishlist_updated", "wishlist": public.dict()},
-    )
+async def _broadcast_event(public_id: str, event: dict) -> None:
+    # В websocket уходят только изменённые поля одного подарка, обезличенно
+    # (без you_*), чтобы не раскрывать индивидуальную информацию.
+    # Клиент может обновить себя по HTTP.
+    # Всплески записей склеиваются планировщиком в одно сообщение за окно.
+    await scheduler.publish(public_id, event)
 
 
 @router.get("", response_model=List[WishlistSummary])
-def list_my_wishlists(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user),
+async def list_my_wishlists(
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(deps.get_current_principal),
 ) -> List[WishlistSummary]:
-    wishlists = (
-        db.query(Wishlist)
-        .filter(Wishlist.owner_id == current_user.id)
-        .order_by(Wishlist.created_at.desc())
-        .all()
+    """
+    Списки пользователя, новые сверху. Без limit/cursor — все сразу;
+    иначе страница по ключу (created_at, id), курсор следующей
+    страницы — в заголовке X-Next-Cursor.
+    """
+    stmt = (
+        select(Wishlist)
+        .where(Wishlist.owner_id == current_user.id)
+        .order_by(Wishlist.created_at.desc(), Wishlist.id.desc())
     )
+    if limit is None and cursor is None:
+        return (await db.scalars(stmt)).all()
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    if cursor is not None:
+        created_at, wishlist_id = decode_cursor(cursor, (datetime, int))
+        stmt = stmt.where(
+            or_(
+                Wishlist.created_at < created_at,
+                and_(Wishlist.created_at == created_at, Wishlist.id < wishlist_id),
+            )
+        )
+    # одна лишняя строка говорит, есть ли следующая страница
+    wishlists = (await db.scalars(stmt.limit(limit + 1))).all()
+    if len(wishlists) > limit:
+        wishlists = wishlists[:limit]
+        last = wishlists[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
     return wishlists
 
 
-@router.post("", response_model=WishlistSummary, status_code=status.HTTP_201_CREATED)
-def create_wishlist(
+@router.post(
+    "",
+    response_model=WishlistSummary,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[deps.rate_limit(CREATE_WISHLIST)],
+)
+async def create_wishlist(
     wishlist_in: WishlistCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(deps.get_current_principal),
 ) -> WishlistSummary:
-    public_id = _generate_public_id(db)
+    public_id = await _generate_public_id(db)
     wishlist = Wishlist(
         owner_id=current_user.id,
         public_id=public_id,
@@ -145,122 +194,350 @@ def create_wishlist(
         event_date=wishlist_in.event_date,
     )
     db.add(wishlist)
-    db.commit()
-    db.refresh(wishlist)
+    await db.commit()
+    await db.refresh(wishlist)
     return wishlist
 
 
 @router.get("/public/{public_id}", response_model=WishlistPublicOut)
 async def get_public_wishlist(
     public_id: str,
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(deps.get_current_user_optional),
-) -> WishlistPublicOut:
-    wishlist = (
-        db.query(Wishlist)
-        .options(
-            joinedload(Wishlist.items)
-            .joinedload(WishlistItem.contributions),
-            joinedload(Wishlist.items)
-            .joinedload(WishlistItem.reservations),
-        )
-        .filter(Wishlist.public_id == public_id)
-        .first()
+    db: AsyncSession = Depends(get_async_read_db),
+    primary_db: AsyncSession = Depends(get_async_db),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    viewer_id: Optional[int] = Depends(deps.get_current_user_id_optional),
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    if limit is not None or cursor is not None:
+        return await _public_wishlist_page(db, public_id, viewer_id, limit, cursor)
+
+    # Снапшот зависит от зрителя (is_owner, you_*), поэтому ETag включает его id.
+    # Пользователя из БД не грузим: хватает id из токена.
+    etag = await snapshot_cache.etag(public_id, viewer_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Cookie"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = await snapshot_cache.get(public_id, etag)
+    if body is None:
+        public = await render_wishlist(db, public_id=public_id, viewer_id=viewer_id)
+        if public is not None and is_replica(db):
+            # Снапшот ляжет в кэш под версией после последней записи: если
+            # реплика её ещё не получила, рендерим заново с основной базы.
+            # Сверка seq — один запрос по уникальному индексу.
+            seq = await primary_db.scalar(
+                select(Wishlist.event_seq).where(Wishlist.public_id == public_id)
+            )
+            if seq is None or seq > public.seq:
+                public = await render_wishlist(
+                    primary_db, public_id=public_id, viewer_id=viewer_id
+                )
+        if public is None:
+            raise HTTPException(status_code=404, detail="Вишлист не найден")
+        body = dumps(public)
+        await snapshot_cache.put(public_id, etag, body)
+    # «*» — только после кэша или рендера: несуществующий вишлист уже получил 404
+    if matches_any_etag(if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _public_wishlist_page(
+    db: AsyncSession,
+    public_id: str,
+    viewer_id: Optional[int],
+    limit: Optional[int],
+    cursor: Optional[str],
+) -> Response:
+    """
+    Страница подарков по id. Страницы не кэшируются: кэш снапшотов хранит
+    только полный список.
+    """
+    limit = limit or DEFAULT_PAGE_SIZE
+    after_item_id = decode_cursor(cursor, (int,))[0] if cursor is not None else None
+    public = await render_wishlist(
+        db,
+        public_id=public_id,
+        viewer_id=viewer_id,
+        after_item_id=after_item_id,
+        limit=limit + 1,
     )
-    if not wishlist:
+    if public is None:
         raise HTTPException(status_code=404, detail="Вишлист не найден")
-    return _wishlist_to_public_out(wishlist, current_user=current_user)
 
+    headers = {"Cache-Control": "no-cache", "Vary": "Cookie"}
+    if len(public.items) > limit:
+        public.items = public.items[:limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(public.items[-1].id)
+    return ORJSONResponse(public, headers=headers)
 
-@router.post("/{wishlist_id}/items", response_model=WishlistPublicOut)
+
+@router.get("/public/{public_id}/items/stream")
+async def stream_public_wishlist(
+    public_id: str,
+    page_size: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    sessionmaker: async_sessionmaker = Depends(read_sessionmaker),
+    viewer_id: Optional[int] = Depends(deps.get_current_user_id_optional),
+) -> StreamingResponse:
+    """
+    Вишлист в формате NDJSON: первая строка — шапка (WishlistPublicOut
+    с пустым items), дальше по строке на подарок в порядке id.
+
+    Подарки читаются страницами по page_size, каждая в своей короткой
+    сессии (и первая тоже: сессия зависимости закрылась бы только после
+    всего ответа), поэтому память не зависит от размера списка, а
+    соединение с БД не удерживается, пока клиент медленно читает. Страницы — не
+    единый снимок: изменения после seq из шапки клиент получает по WebSocket.
+    """
+    async with sessionmaker() as db:
+        first = await render_wishlist(
+            db, public_id=public_id, viewer_id=viewer_id, limit=page_size
+        )
+    if first is None:
+        raise HTTPException(status_code=404, detail="Вишлист не найден")
+
+    async def lines() -> AsyncIterator[bytes]:
+        page = first.items
+        yield dumps(first.copy(update={"items": []})) + b"\n"
+        while True:
+            for item in page:
+                yield dumps(item) + b"\n"
+            if len(page) < page_size:
+                return
+            async with sessionmaker() as page_db:
+                public = await render_wishlist(
+                    page_db,
+                    public_id=public_id,
+                    viewer_id=viewer_id,
+                    after_item_id=page[-1].id,
+                    limit=page_size,
+                )
+            if public is None:
+                # вишлист удалили посреди выдачи
+                return
+            page = public.items
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "Vary": "Cookie"},
+    )
+
+
+@router.post(
+    "/{wishlist_id}/items",
+    response_model=WriteResult,
+    dependencies=[deps.rate_limit(ADD_ITEMS)],
+)
 async def add_item(
     wishlist_id: int,
     item_in: WishlistItemCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user),
-) -> WishlistPublicOut:
-    wishlist = _load_wishlist_with_items(db, wishlist_id)
-    if wishlist.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Можно редактировать только свои списки")
-
-    item = WishlistItem(
-        wishlist_id=wishlist.id,
-        name=item_in.name,
-        url=str(item_in.url) if item_in.url else None,
-        price=item_in.price,
-        image_url=str(item_in.image_url) if item_in.image_url else None,
+    include: str = IncludeQuery,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(deps.get_current_principal),
+) -> ORJSONResponse:
+    wishlist = await _get_own_wishlist(db, wishlist_id, current_user)
+
+    result = await db.execute(
+        insert(WishlistItem)
+        .values(
+            wishlist_id=wishlist.id,
+            name=item_in.name,
+            url=str(item_in.url) if item_in.url else None,
+            price_cents=to_cents(item_in.price),
+            image_url=str(item_in.image_url) if item_in.image_url else None,
+        )
+        .returning(*ITEM_COLUMNS)
     )
-    db.add(item)
-    db.commit()
+    card = item_public(result.one())
+    seq = (await _bump_event_seq(db, wishlist.id)).event_seq
+    await db.commit()
+    await snapshot_cache.invalidate(wishlist.public_id)
 
-    wishlist = _load_wishlist_with_items(db, wishlist.id)
-    await _broadcast_wishlist(wishlist)
-    return _wishlist_to_public_out(wishlist, current_user=current_user)
+    await _broadcast_event(wishlist.public_id, item_added_event(seq, card))
+    # владелец не резервирует и не вносит в свои подарки: you_* пустые
+    return await _write_result(db, include, wishlist.id, current_user, card)
 
 
-@router.post("/items/{item_id}/reserve", response_model=WishlistPublicOut)
+@router.post(
+    "/{wishlist_id}/items/bulk",
+    response_model=BulkItemsResult,
+    dependencies=[deps.rate_limit(ADD_ITEMS)],
+)
+async def add_items_bulk(
+    wishlist_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(deps.get_current_principal),
+) -> ORJSONResponse:
+    """
+    Массовое добавление подарков: JSON-массив, NDJSON или CSV (см. bulk_import).
+    Невалидные строки попадают в errors, остальные вставляются одним
+    многострочным INSERT в одной транзакции, с одним realtime-событием.
+    """
+    # чужой список отсекается до чтения тела
+    wishlist = await _get_own_wishlist(db, wishlist_id, current_user)
+    body = await read_body(request, settings.BULK_ITEMS_MAX_BYTES)
+    valid, errors = parse_items(
+        request.headers.get("content-type", "application/json"),
+        body,
+        max_rows=settings.BULK_ITEMS_MAX_ROWS,
+    )
+    if not valid:
+        return ORJSONResponse(BulkItemsResult.construct(created=[], errors=errors, seq=None))
+
+    result = await db.execute(
+        insert(WishlistItem)
+        .values(
+            [
+                {
+                    "wishlist_id": wishlist.id,
+                    "name": item_in.name,
+                    "url": str(item_in.url) if item_in.url else None,
+                    "price_cents": to_cents(item_in.price),
+                    "image_url": str(item_in.image_url) if item_in.image_url else None,
+                }
+                for _, item_in in valid
+            ]
+        )
+        .returning(*ITEM_COLUMNS)
+    )
+    # порядок строк RETURNING не гарантирован
+    created = sorted((item_public(row) for row in result), key=lambda item: item.id)
+    seq = (await _bump_event_seq(db, wishlist.id)).event_seq
+    await db.commit()
+    await snapshot_cache.invalidate(wishlist.public_id)
+
+    # Большой импорт не влезет в сообщение брокера: соседние инстансы
+    # тогда разошлют своим подписчикам снапшот (см. realtime.broadcast).
+    await _broadcast_event(wishlist.public_id, items_added_event(seq, created))
+    return ORJSONResponse(BulkItemsResult.construct(created=created, errors=errors, seq=seq))
+
+
+@router.post(
+    "/items/{item_id}/reserve",
+    response_model=WriteResult,
+    dependencies=[deps.rate_limit(RESERVE)],
+)
 async def toggle_reservation(
     item_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user),
-) -> WishlistPublicOut:
-    item = (
-        db.query(WishlistItem)
-        .options(
-            joinedload(WishlistItem.wishlist),
-            joinedload(WishlistItem.contributions),
-            joinedload(WishlistItem.reservations),
+    include: str = IncludeQuery,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(deps.get_current_principal),
+) -> ORJSONResponse:
+    # Переключение — один условный UPDATE: свободный подарок резервируется
+    # за пользователем, свой резерв снимается. Строка блокируется этим же
+    # запросом, поэтому из двух одновременных кликов проходит ровно один,
+    # а второй не находит подходящей строки и получает обычный 400.
+    result = await db.execute(
+        update(WishlistItem)
+        .where(
+            WishlistItem.id == item_id,
+            or_(
+                WishlistItem.reserved_by_id.is_(None),
+                WishlistItem.reserved_by_id == current_user.id,
+            ),
+            exists().where(
+                Wishlist.id == WishlistItem.wishlist_id,
+                Wishlist.owner_id != current_user.id,
+            ),
         )
-        .filter(WishlistItem.id == item_id)
-        .first()
+        .values(
+            reserved_by_id=case(
+                (WishlistItem.reserved_by_id.is_(None), current_user.id),
+                else_=None,
+            )
+        )
+        .returning(WishlistItem.wishlist_id, *ITEM_COLUMNS)
+        .execution_options(synchronize_session=False)
     )
-    if not item:
-        raise HTTPException(status_code=404, detail="Подарок не найден")
-
-    wishlist = item.wishlist
-    if wishlist.owner_id == current_user.id:
-        raise HTTPException(
-            status_code=400, detail="Владелец списка не может резервировать свои подарки"
+    toggled = result.one_or_none()
+    if toggled is None:
+        await _raise_reservation_conflict(db, item_id, current_user)
+
+    # reservations повторяет reserved_by_id; строка подарка уже заблокирована,
+    # так что uq_reservation_item здесь не срабатывает
+    if toggled.reserved_by_id is not None:
+        await db.execute(insert(Reservation).values(item_id=item_id, user_id=current_user.id))
+    else:
+        await db.execute(
+            delete(Reservation).where(
+                Reservation.item_id == item_id, Reservation.user_id == current_user.id
+            )
         )
 
-    existing = db.query(Reservation).filter(Reservation.item_id == item_id).first()
-    if existing:
-        if existing.user_id != current_user.id:
-            raise HTTPException(
-                status_code=400, detail="Подарок уже зарезервирован другим пользователем"
-            )
-        # текущий пользователь снимает резерв
-        db.delete(existing)
-    else:
-        reservation = Reservation(item_id=item_id, user_id=current_user.id)
-        db.add(reservation)
+    bumped = await _bump_event_seq(db, toggled.wishlist_id)
+    await db.commit()
+    await snapshot_cache.invalidate(bumped.public_id)
 
-    db.commit()
+    await _broadcast_event(
+        bumped.public_id,
+        item_reservation_changed_event(
+            bumped.event_seq, item_id, has_reservation=toggled.reserved_by_id is not None
+        ),
+    )
+    your_contribution_cents = None
+    if include == INCLUDE_ITEM:
+        your_contribution_cents = await viewer_contribution(db, item_id, current_user.id)
+    return await _write_result(
+        db,
+        include,
+        toggled.wishlist_id,
+        current_user,
+        item_public(
+            toggled,
+            viewer_id=current_user.id,
+            your_contribution_cents=your_contribution_cents,
+        ),
+    )
 
-    wishlist = _load_wishlist_with_items(db, wishlist.id)
-    await _broadcast_wishlist(wishlist)
-    return _wishlist_to_public_out(wishlist, current_user=current_user)
 
+async def _raise_reservation_conflict(
+    db: AsyncSession, item_id: int, current_user: Principal
+) -> NoReturn:
+    """Почему переключение не прошло: нет подарка, свой список или чужой резерв."""
+    state = (
+        await db.execute(
+            select(Wishlist.owner_id)
+            .join(WishlistItem, WishlistItem.wishlist_id == Wishlist.id)
+            .where(WishlistItem.id == item_id)
+        )
+    ).one_or_none()
+    if state is None:
+        raise HTTPException(status_code=404, detail="Подарок не найден")
+    if state.owner_id == current_user.id:
+        raise HTTPException(
+            status_code=400, detail="Владелец списка не может резервировать свои подарки"
+        )
+    raise HTTPException(
+        status_code=400, detail="Подарок уже зарезервирован другим пользователем"
+    )
 
-@router.post("/items/{item_id}/contribute", response_model=WishlistPublicOut)
+
+@router.post(
+    "/items/{item_id}/contribute",
+    response_model=WriteResult,
+    dependencies=[deps.rate_limit(CONTRIBUTE)],
+)
 async def contribute(
     item_id: int,
     contribution_in: ContributionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user),
-) -> WishlistPublicOut:
-    if contribution_in.amount <= 0:
+    include: str = IncludeQuery,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(deps.get_current_principal),
+) -> ORJSONResponse:
+    amount_cents = to_cents(contribution_in.amount)
+    if amount_cents <= 0:
         raise HTTPException(status_code=400, detail="Сумма взноса должна быть больше нуля")
 
-    item = (
-        db.query(WishlistItem)
-        .options(
-            joinedload(WishlistItem.wishlist),
-            joinedload(WishlistItem.contributions),
-            joinedload(WishlistItem.reservations),
-        )
-        .filter(WishlistItem.id == item_id)
-        .first()
+    item = await db.scalar(
+        select(WishlistItem)
+        .options(joinedload(WishlistItem.wishlist))
+        .where(WishlistItem.id == item_id)
+        # блокируем строку подарка до конца транзакции, чтобы агрегаты
+        # обновлялись последовательно
+        .with_for_update(of=WishlistItem)
     )
     if not item:
         raise HTTPException(status_code=404, detail="Подарок не найден")
@@ -274,12 +551,54 @@ async def contribute(
     contribution = Contribution(
         item_id=item_id,
         user_id=current_user.id,
-        amount=contribution_in.amount,
+        amount_cents=amount_cents,
     )
     db.add(contribution)
-    db.commit()
-
-    wishlist = _load_wishlist_with_items(db, wishlist.id)
-    await _broadcast_wishlist(wishlist)
-    return _wishlist_to_public_out(wishlist, current_user=current_user)
+    await db.flush()
+    # Новый участник — если других взносов этого пользователя в подарок нет.
+    # EXISTS читает ix_contributions_item_user, а не всю историю взносов;
+    # строка подарка заблокирована, так что проверка не гоняется сама с собой.
+    earlier = exists().where(
+        Contribution.item_id == item_id,
+        Contribution.user_id == current_user.id,
+        Contribution.id != contribution.id,
+    )
+    result = await db.execute(
+        update(WishlistItem)
+        .where(WishlistItem.id == item_id)
+        .values(
+            total_contributed_cents=WishlistItem.total_contributed_cents + amount_cents,
+            contributors_count=WishlistItem.contributors_count + case((earlier, 0), else_=1),
+        )
+        .returning(*ITEM_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    funding = result.one()
+    your_contribution_cents = None
+    if include == INCLUDE_ITEM:
+        your_contribution_cents = await viewer_contribution(db, item_id, current_user.id)
+    seq = (await _bump_event_seq(db, wishlist.id)).event_seq
+    await db.commit()
+    await snapshot_cache.invalidate(wishlist.public_id)
+
+    await _broadcast_event(
+        wishlist.public_id,
+        item_funding_changed_event(
+            seq,
+            item.id,
+            total_contributed_cents=funding.total_contributed_cents,
+            price_cents=funding.price_cents,
+        ),
+    )
+    return await _write_result(
+        db,
+        include,
+        wishlist.id,
+        current_user,
+        item_public(
+            funding,
+            viewer_id=current_user.id,
+            your_contribution_cents=your_contribution_cents,
+        ),
+    )
 
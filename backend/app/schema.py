@@ -0,0 +1,45 @@
+"""
+Версия схемы БД. Схемой управляет Alembic (backend/migrations),
+приложение таблицы не создаёт — при старте только сверяет ревизию
+базы с последней миграцией и предупреждает, если миграции не применены:
+
+    alembic upgrade head
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def alembic_config() -> Config:
+    return Config(str(ALEMBIC_INI))
+
+
+def head_revision() -> Optional[str]:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(bind: Engine) -> Optional[str]:
+    with bind.connect() as conn:
+        return MigrationContext.configure(conn).get_current_revision()
+
+
+def check_schema(bind: Engine) -> Tuple[Optional[str], Optional[str]]:
+    """Возвращает (ревизия базы, последняя миграция); при расхождении пишет в лог."""
+    current, head = current_revision(bind), head_revision()
+    if current != head:
+        logger.warning(
+            "Схема БД на ревизии %s, последняя миграция %s: выполните `alembic upgrade head`",
+            current or "(нет)",
+            head,
+        )
+    return current, head
@@ -2,7 +2,15 @@ from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Optional
 
-from pydantic import BaseModel, EmailStr, HttpUrl
+from pydantic import BaseModel, EmailStr, HttpUrl, validator
+
+from .money import to_cents
+
+
+def _fits_in_cents(value: Decimal) -> Decimal:
+    # сумма должна помещаться в BIGINT копеек
+    to_cents(value)
+    return value
 
 
 class UserBase(BaseModel):
@@ -30,9 +38,12 @@ class Token(BaseModel):
 class WishlistItemBase(BaseModel):
     name: str
     url: Optional[HttpUrl] = None
+    # рубли; в БД — копейки (money.to_cents)
     price: Decimal
     image_url: Optional[HttpUrl] = None
 
+    _price_fits = validator("price", allow_reuse=True)(_fits_in_cents)
+
 
 class WishlistItemCreate(WishlistItemBase):
     pass
@@ -42,19 +53,26 @@ class WishlistItemPublic(BaseModel):
     """
     DTO для отдачи карточки подарка в публичном и приватном списке.
     Здесь уже есть агрегированные поля по резервациям и взносам.
+    Суммы — целые копейки (*_cents), как в БД.
     """
 
     id: int
     name: str
     url: Optional[HttpUrl] = None
-    price: Decimal
+    price_cents: int
     image_url: Optional[HttpUrl] = None
 
-    total_contributed: Decimal
+    total_contributed_cents: int
     is_fully_funded: bool
     has_reservation: bool
     you_reserved: bool
-    your_contribution: Decimal
+    your_contribution_cents: int
+
+    # устаревшие: те же суммы в рублях float (money.from_cents), для старых
+    # клиентов; на больших суммах теряют копейки
+    price: float
+    total_contributed: float
+    your_contribution: float
 
     class Config:
         orm_mode = True
@@ -94,9 +112,49 @@ class WishlistPublicOut(BaseModel):
     event_date: Optional[date] = None
     created_at: datetime
     is_owner: bool
+    # seq последнего realtime-события, учтённого в этом представлении
+    seq: int = 0
     items: List[WishlistItemPublic]
 
 
+class BulkItemError(BaseModel):
+    # номер строки во входных данных, с 1
+    row: int
+    errors: List[str]
+
+
+class BulkItemsResult(BaseModel):
+    """
+    Итог массового импорта: созданные подарки и ошибки по строкам.
+    seq — номер единственного realtime-события импорта (None, если
+    ничего не создано).
+    """
+
+    created: List[WishlistItemPublic]
+    errors: List[BulkItemError]
+    seq: Optional[int] = None
+
+
 class ContributionCreate(BaseModel):
+    # рубли; в БД — копейки
     amount: Decimal
 
+    _amount_fits = validator("amount", allow_reuse=True)(_fits_in_cents)
+
+
+
+class ActivityEntry(BaseModel):
+    """
+    Запись ленты /me/activity: резерв или взнос пользователя вместе
+    с карточкой подарка (you_* — для этого пользователя) и его вишлистом.
+    """
+
+    kind: str
+    id: int
+    created_at: datetime
+    # сумма взноса в копейках; у резерва — None
+    amount_cents: Optional[int] = None
+    # устаревшее: то же в рублях float
+    amount: Optional[float] = None
+    item: WishlistItemPublic
+    wishlist: WishlistSummary
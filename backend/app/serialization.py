@@ -0,0 +1,39 @@
+"""
+Быстрая сериализация ответов и realtime-сообщений через orjson.
+
+Модели, собранные из наших же строк БД (rendering.py), создаются через
+construct() без валидации и кодируются напрямую: orjson обходит поля
+модели сам, без промежуточных dict()/jsonable_encoder и без повторной
+проверки response_model в FastAPI. Формат совпадает с pydantic .json():
+Decimal — число, даты — ISO 8601.
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        # поля pydantic v1 хранятся в __dict__
+        return obj.__dict__
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"{type(obj).__name__} не сериализуется в JSON")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON-ответ через orjson. Если обработчик вернул его сам, FastAPI
+    не прогоняет содержимое через response_model — для доверенных данных.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
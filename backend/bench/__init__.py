@@ -0,0 +1,9 @@
+"""
+Нагрузочные замеры бэкенда.
+
+    python -m bench.run            # сценарии через create_app() в процессе
+    python -m bench.serialization  # стоимость сериализации вишлиста
+
+Конфигурация приложения берётся из окружения, как обычно (DATABASE_URL
+и т.д.); bench.run по умолчанию поднимает отдельную SQLite-базу.
+"""
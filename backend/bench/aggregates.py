@@ -0,0 +1,90 @@
+"""
+Проверка пересчёта агрегатов: `python -m app.aggregates` в отдельном
+процессе (движки там ещё не созданы, как при запуске руками) должен
+вернуть испорченные total_contributed_cents, contributors_count и
+reserved_by_id к значениям по таблицам contributions и reservations.
+
+    python -m bench.aggregates
+    python -m bench.aggregates --database-url postgresql://localhost/wishlist_bench
+
+Код выхода 1, если скрипт упал или агрегаты не сошлись.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+
+def mismatches(conn) -> List[tuple]:
+    """Подарки, у которых агрегаты расходятся с таблицами взносов и резервов."""
+    from sqlalchemy import distinct, func, or_, select
+
+    from app.models import Contribution, Reservation, WishlistItem
+
+    totals = (
+        select(
+            Contribution.item_id,
+            func.sum(Contribution.amount_cents).label("total"),
+            func.count(distinct(Contribution.user_id)).label("contributors"),
+        )
+        .group_by(Contribution.item_id)
+        .subquery()
+    )
+    total = func.coalesce(totals.c.total, 0)
+    contributors = func.coalesce(totals.c.contributors, 0)
+    stmt = (
+        select(WishlistItem.id)
+        .outerjoin(totals, totals.c.item_id == WishlistItem.id)
+        .outerjoin(Reservation, Reservation.item_id == WishlistItem.id)
+        .where(
+            or_(
+                WishlistItem.total_contributed_cents != total,
+                WishlistItem.contributors_count != contributors,
+                WishlistItem.reserved_by_id.is_distinct_from(Reservation.user_id),
+            )
+        )
+    )
+    return conn.execute(stmt).all()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Проверка python -m app.aggregates")
+    parser.add_argument("--database-url", default=os.environ.get(
+        "BENCH_DATABASE_URL", "sqlite:///./bench.sqlite3"))
+    args = parser.parse_args(argv)
+
+    # настройки приложения читаются при импорте app.*
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+
+    from sqlalchemy import update
+
+    from app.database import get_engine
+    from app.models import WishlistItem
+    from bench.seed import SeedConfig, seed
+
+    seed(SeedConfig(wishlists=5, items_per_wishlist=50, contributions=500))
+    with get_engine().begin() as conn:
+        conn.execute(
+            update(WishlistItem).values(
+                total_contributed_cents=0, contributors_count=0, reserved_by_id=None
+            )
+        )
+        broken = len(mismatches(conn))
+
+    result = subprocess.run([sys.executable, "-m", "app.aggregates"], env=os.environ.copy())
+    if result.returncode:
+        print(f"FAIL  python -m app.aggregates: код выхода {result.returncode}")
+        return 1
+    with get_engine().connect() as conn:
+        left = mismatches(conn)
+    print(f"{'FAIL' if left else 'ok':>4}  испорчено подарков: {broken}, "
+          f"расходятся после пересчёта: {len(left)}")
+    return 1 if left or not broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
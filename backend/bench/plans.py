@@ -0,0 +1,162 @@
+"""
+Планы основных запросов: в EXPLAIN каждого должны быть названы его
+индексы (ix_*). База засевается заново (bench.seed, схема — миграциями),
+статистика собирается ANALYZE, настройки планировщика не трогаются.
+
+    python -m bench.plans
+    python -m bench.plans --database-url postgresql://localhost/wishlist_bench
+
+Те же проверки — тест tests/test_plans.py; скрипт печатает планы целиком
+и годится для своей базы и размеров. Код выхода 1, если хоть в одном
+плане нет ожидаемого индекса.
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+# (название, функция -> SELECT, индексы, которые должны быть в плане)
+Check = Tuple[str, Callable[..., object], Sequence[str]]
+
+
+def checks() -> List[Check]:
+    from sqlalchemy import and_, func, or_, select
+
+    from app.activity import build_activity_query
+    from app.models import Contribution, Wishlist
+    from app.rendering import build_wishlist_query
+
+    def first_wishlist(data):
+        public_id, (wishlist_id, owner_id) = next(iter(data.wishlists.items()))
+        return public_id, wishlist_id, owner_id
+
+    def public_page(data):
+        public_id, _, owner_id = first_wishlist(data)
+        guest = next(u for u in data.user_ids if u != owner_id)
+        return build_wishlist_query(public_id=public_id, viewer_id=guest, limit=50)
+
+    def owner_page(data):
+        _, wishlist_id, _ = first_wishlist(data)
+        return build_wishlist_query(wishlist_id=wishlist_id, after_item_id=10, limit=50)
+
+    def my_wishlists(data):
+        _, _, owner_id = first_wishlist(data)
+        created_at, last_id = datetime.utcnow(), 10**9
+        return (
+            select(Wishlist)
+            .where(Wishlist.owner_id == owner_id)
+            .where(
+                or_(
+                    Wishlist.created_at < created_at,
+                    and_(Wishlist.created_at == created_at, Wishlist.id < last_id),
+                )
+            )
+            .order_by(Wishlist.created_at.desc(), Wishlist.id.desc())
+            .limit(51)
+        )
+
+    def viewer_contribution(data):
+        item_id = next(iter(data.item_owner))
+        return select(func.coalesce(func.sum(Contribution.amount_cents), 0)).where(
+            Contribution.item_id == item_id, Contribution.user_id == data.user_ids[0]
+        )
+
+    def activity_page(data):
+        after = (datetime.utcnow(), "contribution", 10**9)
+        return build_activity_query(data.user_ids[0], after=after, limit=51)
+
+    return [
+        (
+            "public wishlist page",
+            public_page,
+            ("ix_wishlists_public_id", "ix_wishlist_items_wishlist_id",
+             "ix_contributions_item_user"),
+        ),
+        ("owner wishlist page", owner_page, ("ix_wishlist_items_wishlist_id",)),
+        ("list_my_wishlists page", my_wishlists, ("ix_wishlists_owner_created",)),
+        ("viewer contribution", viewer_contribution, ("ix_contributions_item_user",)),
+        (
+            "/me/activity page",
+            activity_page,
+            ("ix_contributions_user_activity", "ix_reservations_user_activity",
+             "ix_contributions_item_user"),
+        ),
+    ]
+
+
+def _walk(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _walk(child)
+
+
+def explain(conn, stmt) -> List[str]:
+    """Строки плана запроса; в строках с индексом есть его имя."""
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+        return [row[-1] for row in rows]
+
+    if conn.dialect.name == "postgresql":
+        rows = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+        return [
+            " ".join(
+                filter(None, (node["Node Type"], node.get("Relation Name"), node.get("Index Name")))
+            )
+            for node in _walk(rows[0]["Plan"])
+        ]
+
+    raise SystemExit(f"EXPLAIN для {conn.dialect.name} не поддерживается")
+
+
+def missing_indexes(lines: Sequence[str], indexes: Sequence[str]) -> List[str]:
+    """Индексы из списка, которых план не называет."""
+    used = {word for line in lines for word in line.split()}
+    return [name for name in indexes if name not in used]
+
+
+def analyze(engine) -> None:
+    """Собрать статистику после засева, чтобы планировщик видел реальные размеры."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Проверка планов основных запросов")
+    parser.add_argument("--database-url", default=os.environ.get(
+        "BENCH_DATABASE_URL", "sqlite:///./bench.sqlite3"))
+    parser.add_argument("--wishlists", type=int, default=20)
+    parser.add_argument("--items", type=int, default=100, help="подарков на вишлист")
+    args = parser.parse_args(argv)
+
+    # настройки приложения читаются при импорте app.*
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+
+    from app.database import get_engine
+    from bench.seed import SeedConfig, seed
+
+    data = seed(SeedConfig(wishlists=args.wishlists, items_per_wishlist=args.items))
+    analyze(get_engine())
+    failed = 0
+    with get_engine().connect() as conn:
+        for name, build, indexes in checks():
+            lines = explain(conn, build(data))
+            missing = missing_indexes(lines, indexes)
+            failed += bool(missing)
+            note = f": в плане нет {', '.join(missing)}" if missing else ""
+            print(f"{'FAIL' if missing else 'ok':>4}  {name}{note}")
+            for line in lines:
+                print(f"        {line}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
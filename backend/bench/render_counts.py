@@ -0,0 +1,97 @@
+"""
+Проверка рендеринга вишлиста (app.rendering): на 200 подарках
+и 5 000 взносах render_wishlist делает один SQL-запрос, который
+возвращает строку на подарок, а не подарки × взносы.
+
+    python -m bench.render_counts
+    python -m bench.render_counts --database-url postgresql://localhost/wishlist_bench
+
+Зритель — пользователь с наибольшим числом взносов, так что к подаркам
+присоединяются и его строки contributions; его суммы сверяются
+с прямым SUM по таблице. Код выхода 1, если хоть одна проверка не прошла.
+
+Те же инварианты закреплены тестом tests/test_rendering.py; скрипт —
+для прогона на своей базе (например, Postgres) и других размеров.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from typing import List, Optional
+
+# один SQL-запрос на рендер целиком
+EXPECTED_QUERIES = 1
+
+
+async def run(args) -> int:
+    from sqlalchemy import func, select
+
+    from app.database import AsyncSessionLocal, init_engines
+    from app.instrumentation import track_queries
+    from app.models import Contribution
+    from app.rendering import build_wishlist_query, render_wishlist
+    from bench.seed import SeedConfig, seed
+
+    data = seed(SeedConfig(wishlists=1, items_per_wishlist=args.items,
+                           contributions=args.contributions))
+    public_id = next(iter(data.wishlists))
+    init_engines()
+
+    failed = 0
+
+    def check(ok: bool, line: str) -> None:
+        nonlocal failed
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {line}")
+
+    async with AsyncSessionLocal() as db:
+        viewer_id, viewer_contributions = (
+            await db.execute(
+                select(Contribution.user_id, func.count())
+                .group_by(Contribution.user_id)
+                .order_by(func.count().desc())
+                .limit(1)
+            )
+        ).one()
+        total = await db.scalar(select(func.count()).select_from(Contribution))
+        print(f"Подарков: {args.items}, взносов: {total}, "
+              f"зритель {viewer_id} с {viewer_contributions} взносами")
+
+        for label, viewer in (("гость", None), ("зритель", viewer_id)):
+            rows = (
+                await db.execute(build_wishlist_query(public_id=public_id, viewer_id=viewer))
+            ).all()
+            check(len(rows) == args.items, f"{label}: строк из запроса {len(rows)}, "
+                                           f"ожидается {args.items}")
+            with track_queries() as stats:
+                public = await render_wishlist(db, public_id=public_id, viewer_id=viewer)
+            check(stats.queries == EXPECTED_QUERIES,
+                  f"{label}: SQL-запросов на рендер {stats.queries}, ожидается {EXPECTED_QUERIES}")
+            check(len(public.items) == args.items, f"{label}: подарков в ответе {len(public.items)}")
+
+        expected = await db.scalar(
+            select(func.sum(Contribution.amount_cents)).where(Contribution.user_id == viewer_id)
+        )
+        rendered = sum(row.your_contribution_cents for row in rows)
+        check(rendered == expected, f"зритель: сумма взносов {rendered}, по таблице {expected}")
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Число строк и запросов рендеринга вишлиста")
+    parser.add_argument("--database-url", default=os.environ.get(
+        "BENCH_DATABASE_URL", "sqlite:///./bench.sqlite3"))
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--contributions", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    # настройки приложения читаются при импорте app.*
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
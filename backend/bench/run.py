@@ -0,0 +1,465 @@
+"""
+Нагрузочный прогон бэкенда в одном процессе.
+
+База засевается заново (bench.seed), create_app() вызывается через
+httpx.ASGITransport и WebSocket-клиенты bench.ws, без сети. Для каждого
+сценария считаются p50/p95/p99, максимум и пропускная способность,
+итог сохраняется в JSON вместе с коммитом и параметрами прогона.
+
+    python -m bench.run
+    python -m bench.run --database-url postgresql://localhost/wishlist_bench
+    python -m bench.run --scenarios public_read,contribute --baseline old.json
+
+Сценарии:
+- public_read — GET /wishlists/public/{id}, аноним и авторизованные вперемешку;
+- reserve     — переключение резерва случайного подарка (400 на чужой резерв — норма);
+- contribute  — взнос в случайный подарок;
+- reserve_hot — переключения резерва и взносы в один подарок от
+  нескольких гостей разом; после прогона сверяются reserved_by_id,
+  строки reservations, сумма взносов и event_seq вишлиста — при
+  расхождении код выхода 1;
+- login       — POST /auth/login (bcrypt при текущем BCRYPT_ROUNDS);
+- fanout      — подписчики на одном вишлисте, задержка от начала записи
+  до получения события каждым подписчиком.
+
+Все клиенты прогона приходят с одного адреса и пишут чаще, чем
+позволяют лимиты на клиента, поэтому RATE_LIMIT_ENABLED по умолчанию
+выключен; общий лимит запросов в работе (AdmissionMiddleware) остаётся.
+
+Нужен httpx (pip install httpx). Запуск из backend/.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+SCENARIOS = ("public_read", "reserve", "contribute", "reserve_hot", "login", "fanout")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Процентиль методом ближайшего ранга; values отсортированы."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], elapsed: float, statuses: Dict[str, int]) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        "statuses": statuses,
+    }
+
+
+async def run_requests(
+    total: int,
+    concurrency: int,
+    request: Callable[[int], Awaitable[int]],
+    ok: Callable[[int], bool] = lambda status: status < 400,
+) -> dict:
+    """total запросов в concurrency параллельных потоков."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        for n in counter:
+            started = time.perf_counter()
+            status = await request(n)
+            latencies.append(time.perf_counter() - started)
+            key = str(status) if ok(status) else f"error_{status}"
+            statuses[key] = statuses.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+
+class Bench:
+    def __init__(self, app, client, data, args) -> None:
+        from app.auth import AUTH_COOKIE_NAME, create_access_token
+
+        self.app = app
+        self.client = client
+        self.data = data
+        self.args = args
+        self.rnd = random.Random(args.seed)
+        self.cookie_name = AUTH_COOKIE_NAME
+        self.tokens = {
+            user_id: create_access_token(data={"sub": str(user_id)})
+            for user_id in data.user_ids
+        }
+        self.public_ids = list(data.wishlists)
+        self.item_ids = list(data.item_owner)
+
+    def auth(self, user_id: int) -> dict:
+        return {"Cookie": f"{self.cookie_name}={self.tokens[user_id]}"}
+
+    def guest_for(self, item_id: int) -> int:
+        owner_id = self.data.item_owner[item_id]
+        while True:
+            user_id = self.rnd.choice(self.data.user_ids)
+            if user_id != owner_id:
+                return user_id
+
+    async def public_read(self) -> dict:
+        async def request(n: int) -> int:
+            public_id = self.rnd.choice(self.public_ids)
+            headers = self.auth(self.rnd.choice(self.data.user_ids)) if n % 2 else {}
+            response = await self.client.get(f"/wishlists/public/{public_id}", headers=headers)
+            return response.status_code
+
+        return await run_requests(self.args.requests, self.args.concurrency, request)
+
+    async def reserve(self) -> dict:
+        async def request(n: int) -> int:
+            item_id = self.rnd.choice(self.item_ids)
+            response = await self.client.post(
+                f"/wishlists/items/{item_id}/reserve",
+                params={"include": "item"},
+                headers=self.auth(self.guest_for(item_id)),
+            )
+            return response.status_code
+
+        # 400 — подарок зарезервирован другим: ожидаемый исход гонки
+        return await run_requests(
+            self.args.requests, self.args.concurrency, request, ok=lambda s: s in (200, 400)
+        )
+
+    async def contribute(self) -> dict:
+        async def request(n: int) -> int:
+            item_id = self.rnd.choice(self.item_ids)
+            response = await self.client.post(
+                f"/wishlists/items/{item_id}/contribute",
+                params={"include": "item"},
+                json={"amount": "1.00"},
+                headers=self.auth(self.guest_for(item_id)),
+            )
+            return response.status_code
+
+        return await run_requests(self.args.requests, self.args.concurrency, request)
+
+    def hot_item_state(self, item_id: int) -> dict:
+        """Состояние подарка и его вишлиста прямо из базы, мимо кэшей."""
+        from sqlalchemy import distinct, func, select
+
+        from app.database import SessionLocal
+        from app.models import Contribution, Reservation, Wishlist, WishlistItem
+
+        with SessionLocal() as db:
+            item = db.execute(
+                select(
+                    WishlistItem.reserved_by_id,
+                    WishlistItem.total_contributed_cents,
+                    WishlistItem.contributors_count,
+                    Wishlist.event_seq,
+                )
+                .join(Wishlist, Wishlist.id == WishlistItem.wishlist_id)
+                .where(WishlistItem.id == item_id)
+            ).one()
+            total, contributors = db.execute(
+                select(
+                    func.coalesce(func.sum(Contribution.amount_cents), 0),
+                    func.count(distinct(Contribution.user_id)),
+                ).where(Contribution.item_id == item_id)
+            ).one()
+            reservations = db.scalars(
+                select(Reservation.user_id).where(Reservation.item_id == item_id)
+            ).all()
+        return {
+            "reserved_by_id": item.reserved_by_id,
+            "total_contributed_cents": item.total_contributed_cents,
+            "contributors_count": item.contributors_count,
+            "event_seq": item.event_seq,
+            "contributions_sum": total,
+            "contributors": contributors,
+            "reservations": list(reservations),
+        }
+
+    async def reserve_hot(self) -> dict:
+        """
+        Все запросы — в один подарок: чётные переключают резерв, нечётные
+        вносят по 1.00, гости по кругу. Из успешных ответов выводится, каким
+        должно стать состояние, и сверяется с базой.
+        """
+        item_id = self.item_ids[0]
+        owner_id = self.data.item_owner[item_id]
+        guests = [u for u in self.data.user_ids if u != owner_id][: self.args.hot_users]
+        before = self.hot_item_state(item_id)
+        toggled = {user_id: 0 for user_id in guests}
+        contributed = 0
+
+        async def request(n: int) -> int:
+            nonlocal contributed
+            user_id = guests[n % len(guests)]
+            if n % 2 == 0:
+                response = await self.client.post(
+                    f"/wishlists/items/{item_id}/reserve", headers=self.auth(user_id)
+                )
+                if response.status_code == 200:
+                    toggled[user_id] += 1
+            else:
+                response = await self.client.post(
+                    f"/wishlists/items/{item_id}/contribute",
+                    json={"amount": "1.00"},
+                    headers=self.auth(user_id),
+                )
+                if response.status_code == 200:
+                    contributed += 1
+            return response.status_code
+
+        result = await run_requests(
+            self.args.requests, self.args.concurrency, request, ok=lambda s: s in (200, 400)
+        )
+        after = self.hot_item_state(item_id)
+
+        # резерв у того, чей счёт (был ли резерв + успешные переключения) нечётен
+        holders = [
+            user_id
+            for user_id in set(guests) | {before["reserved_by_id"]} - {None}
+            if ((before["reserved_by_id"] == user_id) + toggled.get(user_id, 0)) % 2
+        ]
+        expected = {
+            "reserved_by_id": holders[0] if len(holders) == 1 else None,
+            "reservations": holders,
+            "total_contributed_cents": before["total_contributed_cents"] + contributed * 100,
+            "contributions_sum": before["contributions_sum"] + contributed * 100,
+            "event_seq": before["event_seq"] + sum(toggled.values()) + contributed,
+        }
+        errors = [
+            f"{key}: {after[key]} вместо {value}"
+            for key, value in expected.items()
+            if after[key] != value
+        ]
+        if len(holders) > 1:
+            errors.append(f"резерв одновременно у {holders}")
+        if after["contributors_count"] != after["contributors"]:
+            errors.append(
+                f"contributors_count: {after['contributors_count']} "
+                f"вместо {after['contributors']}"
+            )
+        result["toggles"] = sum(toggled.values())
+        result["contributions"] = contributed
+        result["errors"] = errors
+        return result
+
+    async def login(self) -> dict:
+        from bench.seed import PASSWORD
+
+        async def request(n: int) -> int:
+            email = self.data.emails[self.rnd.choice(self.data.user_ids)]
+            response = await self.client.post(
+                "/auth/login", params={"email": email, "password": PASSWORD}
+            )
+            return response.status_code
+
+        return await run_requests(self.args.login_requests, self.args.concurrency, request)
+
+    async def fanout(self) -> dict:
+        """
+        subscribers сокетов на одном вишлисте, writes последовательных взносов.
+        Задержка — от начала POST до получения события с этим seq каждым
+        подписчиком (склеенное items_changed покрывает несколько seq).
+        """
+        from bench.ws import ASGIWebSocket
+
+        public_id = self.public_ids[0]
+        items = [i for i, pid in self.data.item_wishlist.items() if pid == public_id]
+        sockets = [
+            await ASGIWebSocket(self.app, f"/ws/wishlists/{public_id}").connect()
+            for _ in range(self.args.subscribers)
+        ]
+        snapshots = [json.loads(await ws.receive_text()) for ws in sockets]
+        base_seq = max(s["seq"] for s in snapshots)
+        writes = self.args.writes
+        started_at: Dict[int, float] = {}
+        latencies: List[float] = []
+
+        async def consume(ws: ASGIWebSocket) -> None:
+            seen = base_seq
+            while seen < base_seq + writes:
+                message = json.loads(await ws.receive_text())
+                received = time.perf_counter()
+                for seq in range(max(message.get("from_seq", message["seq"]), seen + 1),
+                                 message["seq"] + 1):
+                    latencies.append(received - started_at[seq])
+                seen = max(seen, message["seq"])
+
+        consumers = [asyncio.create_task(consume(ws)) for ws in sockets]
+        statuses: Dict[str, int] = {}
+        started = time.perf_counter()
+        for n in range(writes):
+            item_id = self.rnd.choice(items)
+            started_at[base_seq + n + 1] = time.perf_counter()
+            response = await self.client.post(
+                f"/wishlists/items/{item_id}/contribute",
+                params={"include": "item"},
+                json={"amount": "1.00"},
+                headers=self.auth(self.guest_for(item_id)),
+            )
+            key = str(response.status_code)
+            statuses[key] = statuses.get(key, 0) + 1
+        try:
+            await asyncio.wait_for(asyncio.gather(*consumers), timeout=self.args.timeout)
+        except asyncio.TimeoutError:
+            statuses["timeout"] = 1
+        elapsed = time.perf_counter() - started
+        for ws in sockets:
+            await ws.close()
+        result = summarize(latencies, elapsed, statuses)
+        result["subscribers"] = self.args.subscribers
+        result["writes"] = writes
+        return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Строки отчёта о регрессиях: рост p95/p99 или падение throughput больше threshold."""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s"):
+            before, after = old.get(key), result.get(key)
+            if not before:
+                continue
+            change = (after - before) / before
+            print(f"  {name:>12} {key:>16}: {before:>10} -> {after:>10} ({change:+.1%})")
+            worse = change < -threshold if key == "throughput_per_s" else change > threshold
+            if worse and key != "p50_ms":
+                regressions.append(f"{name}.{key} {change:+.1%}")
+    return regressions
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from app.main import create_app
+    from bench.seed import SeedConfig, seed
+
+    data = seed(
+        SeedConfig(
+            users=args.users,
+            wishlists=args.wishlists,
+            items_per_wishlist=args.items,
+            contributions=args.contributions,
+            seed=args.seed,
+        )
+    )
+    app = create_app()
+    await app.router.startup()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            bench = Bench(app, client, data, args)
+            for name in args.scenarios:
+                print(f"-> {name}", flush=True)
+                results[name] = await getattr(bench, name)()
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон бэкенда")
+    parser.add_argument("--database-url", default=os.environ.get(
+        "BENCH_DATABASE_URL", "sqlite:///./bench.sqlite3"))
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--wishlists", type=int, default=20)
+    parser.add_argument("--items", type=int, default=100, help="подарков на вишлист")
+    parser.add_argument("--contributions", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=500, help="запросов на сценарий")
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--hot-users", type=int, default=5,
+                        help="гостей, которые бьют в один подарок в reserve_hot")
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="куда сохранить JSON (по умолчанию bench/results/)")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="допустимое ухудшение p95/p99/throughput")
+    args = parser.parse_args(argv)
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+    # настройки приложения читаются при импорте app.*
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    scenarios = asyncio.run(run(args))
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": args.database_url.split(":", 1)[0],
+        "params": {k: v for k, v in vars(args).items()
+                   if k not in ("out", "baseline", "database_url")},
+        "scenarios": scenarios,
+    }
+
+    for name, result in scenarios.items():
+        print(
+            f"{name:>12}: {result['count']:>6} шт, {result['throughput_per_s']:>9}/с, "
+            f"p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, "
+            f"p99 {result['p99_ms']} мс  {result['statuses']}"
+        )
+
+    inconsistent = [
+        f"{name}: {error}" for name, result in scenarios.items() for error in result.get("errors", ())
+    ]
+    for line in inconsistent:
+        print(f"Расхождение {line}")
+
+    out = args.out or os.path.join(
+        os.path.dirname(__file__), "results",
+        f"{report['timestamp'].replace(':', '')}-{report['commit'] or 'nogit'}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результат: {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print("Регрессии: " + ", ".join(regressions))
+            return 1
+    return 1 if inconsistent else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Наполнение базы для замеров: пользователи, вишлисты, подарки, взносы
+и резервы. Генерация детерминирована (random.Random(seed)), так что
+прогоны на разных коммитах видят одинаковые данные.
+
+Схема создаётся миграциями (alembic upgrade head), как в рабочей базе.
+Все пользователи получают пароль PASSWORD, хэш считается один раз.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from alembic import command
+from sqlalchemy import insert, select, text
+
+from app.aggregates import repair_item_aggregates
+from app.config import settings
+from app.database import Base, SessionLocal, get_engine
+from app.hashing import _hash
+from app.models import Contribution, Reservation, User, Wishlist, WishlistItem
+from app.schema import alembic_config
+
+PASSWORD = "bench-password"
+# строк в одном INSERT ... VALUES при засеве
+_CHUNK = 1000
+
+
+@dataclass
+class SeedConfig:
+    users: int = 50
+    wishlists: int = 20
+    items_per_wishlist: int = 100
+    contributions: int = 2000
+    reserved_share: float = 0.2
+    seed: int = 1
+
+
+@dataclass
+class SeedData:
+    """id созданных записей — по ним сценарии выбирают цели запросов."""
+
+    user_ids: List[int] = field(default_factory=list)
+    emails: Dict[int, str] = field(default_factory=dict)
+    # public_id -> (id вишлиста, id владельца)
+    wishlists: Dict[str, tuple] = field(default_factory=dict)
+    # id подарка -> id владельца вишлиста
+    item_owner: Dict[int, int] = field(default_factory=dict)
+    # id подарка -> public_id его вишлиста
+    item_wishlist: Dict[int, str] = field(default_factory=dict)
+
+
+def _insert_chunks(db, model, rows: List[dict]) -> None:
+    for start in range(0, len(rows), _CHUNK):
+        db.execute(insert(model), rows[start:start + _CHUNK])
+
+
+def seed(config: SeedConfig) -> SeedData:
+    rnd = random.Random(config.seed)
+    engine = get_engine()
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    command.upgrade(alembic_config(), "head")
+    hashed = _hash(PASSWORD, settings.BCRYPT_ROUNDS)
+    data = SeedData()
+
+    with SessionLocal() as db:
+        _insert_chunks(
+            db,
+            User,
+            [
+                {"email": f"user{i}@bench.local", "name": f"User {i}", "hashed_password": hashed}
+                for i in range(config.users)
+            ],
+        )
+        for user_id, email in db.execute(select(User.id, User.email)):
+            data.user_ids.append(user_id)
+            data.emails[user_id] = email
+
+        _insert_chunks(
+            db,
+            Wishlist,
+            [
+                {
+                    "owner_id": rnd.choice(data.user_ids),
+                    "public_id": f"bench-{i}",
+                    "title": f"Вишлист {i}",
+                }
+                for i in range(config.wishlists)
+            ],
+        )
+        wishlists = db.execute(select(Wishlist.id, Wishlist.public_id, Wishlist.owner_id)).all()
+        for wishlist_id, public_id, owner_id in wishlists:
+            data.wishlists[public_id] = (wishlist_id, owner_id)
+
+        _insert_chunks(
+            db,
+            WishlistItem,
+            [
+                {
+                    "wishlist_id": wishlist_id,
+                    "name": f"Подарок {n}",
+                    "url": f"https://shop.example.com/{wishlist_id}/{n}",
+                    "price_cents": rnd.randrange(500, 50_000) * 100,
+                }
+                for wishlist_id, _, _ in wishlists
+                for n in range(config.items_per_wishlist)
+            ],
+        )
+        by_id = {wishlist_id: (public_id, owner_id) for wishlist_id, public_id, owner_id in wishlists}
+        for item_id, wishlist_id in db.execute(select(WishlistItem.id, WishlistItem.wishlist_id)):
+            data.item_wishlist[item_id], data.item_owner[item_id] = by_id[wishlist_id]
+        item_ids = list(data.item_owner)
+
+        def guest_for(item_id: int) -> int:
+            while True:
+                user_id = rnd.choice(data.user_ids)
+                if user_id != data.item_owner[item_id] or len(data.user_ids) == 1:
+                    return user_id
+
+        contributions = []
+        for _ in range(config.contributions if item_ids else 0):
+            item_id = rnd.choice(item_ids)
+            contributions.append(
+                {
+                    "item_id": item_id,
+                    "user_id": guest_for(item_id),
+                    "amount_cents": rnd.randrange(100, 2000) * 100,
+                }
+            )
+        _insert_chunks(db, Contribution, contributions)
+
+        reserved = rnd.sample(item_ids, int(len(item_ids) * config.reserved_share))
+        _insert_chunks(
+            db,
+            Reservation,
+            [{"item_id": item_id, "user_id": guest_for(item_id)} for item_id in reserved],
+        )
+        db.commit()
+        repair_item_aggregates(db)
+    return data
@@ -0,0 +1,126 @@
+"""
+Стоимость сериализации WishlistPublicOut на подарок: старый путь
+(валидация моделей + jsonable_encoder + json.dumps) против доверенного
+(construct + orjson).
+
+Запуск из backend/:
+
+    python -m bench.serialization [--items 500] [--repeat 200]
+
+БД не нужна: строки подарков генерируются в памяти в том виде,
+в каком их возвращает RETURNING/запрос рендеринга.
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, List
+
+# Настройки приложения читаются и проверяются при импорте app.*:
+# база не открывается, но обязательные переменные должны быть заданы
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.money import from_cents  # noqa: E402
+from app.rendering import item_public  # noqa: E402
+from app.schemas import WishlistItemPublic, WishlistPublicOut  # noqa: E402
+from app.serialization import dumps  # noqa: E402
+
+
+def make_rows(count: int) -> List[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            id=i,
+            name=f"Подарок {i}",
+            url=f"https://shop.example.com/items/{i}",
+            price_cents=199990,
+            image_url=f"https://cdn.example.com/img/{i}.jpg",
+            total_contributed_cents=15000,
+            reserved_by_id=7 if i % 3 == 0 else None,
+            your_contribution_cents=5000 if i % 5 == 0 else 0,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+HEAD = dict(
+    id=1,
+    public_id="bench",
+    title="Свадьба",
+    description=None,
+    event_date=None,
+    created_at=datetime(2026, 1, 1, 12, 0),
+    is_owner=False,
+    seq=42,
+)
+
+
+def validated(rows: List[SimpleNamespace]) -> bytes:
+    """Как раньше: модели с валидацией, затем jsonable_encoder и json.dumps."""
+    items = [
+        WishlistItemPublic(
+            id=row.id,
+            name=row.name,
+            url=row.url,
+            price_cents=row.price_cents,
+            image_url=row.image_url,
+            total_contributed_cents=row.total_contributed_cents,
+            is_fully_funded=row.total_contributed_cents >= row.price_cents,
+            has_reservation=row.reserved_by_id is not None,
+            you_reserved=row.reserved_by_id == 7,
+            your_contribution_cents=row.your_contribution_cents,
+            price=from_cents(row.price_cents),
+            total_contributed=from_cents(row.total_contributed_cents),
+            your_contribution=from_cents(row.your_contribution_cents),
+        )
+        for row in rows
+    ]
+    public = WishlistPublicOut(**HEAD, items=items)
+    return json.dumps(jsonable_encoder(public)).encode()
+
+
+def trusted(rows: List[SimpleNamespace]) -> bytes:
+    """Сейчас: construct() без валидации и orjson."""
+    items = [
+        item_public(row, viewer_id=7, your_contribution_cents=row.your_contribution_cents)
+        for row in rows
+    ]
+    return dumps(WishlistPublicOut.construct(**HEAD, items=items))
+
+
+def measure(func: Callable[[List[SimpleNamespace]], bytes], rows, repeat: int) -> float:
+    func(rows)  # прогрев
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(rows)
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_rows(args.items)
+    assert json.loads(validated(rows)) == json.loads(trusted(rows)), "разный JSON"
+
+    results = {
+        name: measure(func, rows, args.repeat)
+        for name, func in (("validated", validated), ("trusted", trusted))
+    }
+    for name, seconds in results.items():
+        print(
+            f"{name:>10}: {seconds * 1000:8.3f} мс на список, "
+            f"{seconds / args.items * 1e6:6.2f} мкс на подарок"
+        )
+    print(f"  ускорение: x{results['validated'] / results['trusted']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
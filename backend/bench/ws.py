@@ -0,0 +1,65 @@
+"""
+WebSocket-клиент, который говорит с ASGI-приложением напрямую, в том же
+event loop: без сети и без потоков TestClient, поэтому сотни подписчиков
+живут в одном процессе с сервером.
+"""
+
+import asyncio
+from typing import Dict, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+
+class WebSocketClosed(Exception):
+    def __init__(self, code: int) -> None:
+        super().__init__(code)
+        self.code = code
+
+
+class ASGIWebSocket:
+    def __init__(
+        self, app, url: str, headers: Sequence[Tuple[str, str]] = ()
+    ) -> None:
+        self.app = app
+        self.url = urlsplit(url)
+        self.headers = headers
+        self._to_app: "asyncio.Queue[Dict]" = asyncio.Queue()
+        self._from_app: "asyncio.Queue[Dict]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> "ASGIWebSocket":
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "server": ("bench", 80),
+            "client": ("127.0.0.1", 0),
+            "root_path": "",
+            "path": self.url.path,
+            "raw_path": self.url.path.encode(),
+            "query_string": self.url.query.encode(),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in self.headers],
+            "subprotocols": [],
+        }
+        self._task = asyncio.create_task(self.app(scope, self._to_app.get, self._from_app.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._from_app.get()
+        if message["type"] != "websocket.accept":
+            raise WebSocketClosed(message.get("code", 1000))
+        return self
+
+    async def receive_text(self) -> str:
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            raise WebSocketClosed(message.get("code", 1000))
+        return message["text"]
+
+    async def send_text(self, text: str) -> None:
+        await self._to_app.put({"type": "websocket.receive", "text": text})
+
+    async def close(self) -> None:
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except Exception:
+                self._task.cancel()
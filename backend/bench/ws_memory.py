@@ -0,0 +1,257 @@
+"""
+Память и стоимость операций на WebSocket-подключение: сколько процесс
+приложения держит на тихого подписчика и как ведут себя реестр,
+рассылка и обход heartbeat на ~100 000 сокетов.
+
+    python -m bench.ws_memory
+    python -m bench.ws_memory --connections 20000 --wishlists 10
+
+Сокеты подключаются к create_app() напрямую по ASGI, в том же event
+loop. Клиентская сторона минимальна (future на закрытие), её стоимость
+замеряется отдельно и вычитается. В результат входит всё, что
+приложение держит на сокет: задача обработчика wishlist_ws, WebSocket
+Starlette, запись реестра, счётчики лимитов. Транспорт ASGI-сервера
+(uvicorn и буферы websockets) не входит: он зависит от сервера.
+
+Первый подписчик вишлиста получает снапшот из БД, остальные приходят
+с ?last_seq и получают пустой повтор из буфера, как при переподключении
+без пропусков, — без рендера на каждый сокет.
+
+Нужен httpx (pip install httpx). Запуск из backend/.
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from typing import List, Optional, Tuple
+
+# подключений за раз
+_BATCH = 1000
+
+
+def rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def memory() -> Tuple[int, Optional[int]]:
+    """(байты под объектами Python по tracemalloc, RSS процесса)."""
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0], rss_bytes()
+
+
+class Peer:
+    """Клиентская сторона сокета: ASGI receive/send без очередей."""
+
+    __slots__ = ("connected", "accepted", "closed", "task")
+
+    # текстовых сообщений, полученных всеми клиентами
+    received = 0
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.connected = False
+        self.accepted = loop.create_future()
+        self.closed = loop.create_future()
+        self.task: Optional[asyncio.Task] = None
+
+    async def receive(self) -> dict:
+        if not self.connected:
+            self.connected = True
+            return {"type": "websocket.connect"}
+        return await self.closed
+
+    async def send(self, message: dict) -> None:
+        kind = message["type"]
+        if kind == "websocket.send":
+            Peer.received += 1
+        elif not self.accepted.done():
+            self.accepted.set_result(kind == "websocket.accept")
+
+    def connect(self, app, path: str, query: str) -> None:
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "server": ("bench", 80),
+            "client": ("127.0.0.1", 0),
+            "root_path": "",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": [],
+            "subprotocols": [],
+        }
+        self.task = asyncio.create_task(app(scope, self.receive, self.send))
+
+    def disconnect(self) -> None:
+        if not self.closed.done():
+            self.closed.set_result({"type": "websocket.disconnect", "code": 1000})
+
+
+async def wait_received(count: int, timeout: float) -> float:
+    """Ждёт, пока клиенты получат count сообщений; секунды ожидания."""
+    started = time.perf_counter()
+    while Peer.received < count:
+        if time.perf_counter() - started > timeout:
+            raise SystemExit(f"Получено {Peer.received} сообщений из {count} за {timeout} с")
+        await asyncio.sleep(0.001)
+    return time.perf_counter() - started
+
+
+def per_connection(before: Tuple[int, Optional[int]], after: Tuple[int, Optional[int]],
+                   count: int, client: int = 0) -> str:
+    traced = (after[0] - before[0] - client) / count
+    line = f"{traced:,.0f} Б по tracemalloc"
+    if before[1] is not None and after[1] is not None:
+        line += f", {(after[1] - before[1]) / count:,.0f} Б по RSS (с клиентами и tracemalloc)"
+    return line
+
+
+async def connect_batch(app, public_ids: List[str], start: int, stop: int) -> List[Peer]:
+    loop = asyncio.get_running_loop()
+    batch = [Peer(loop) for _ in range(start, stop)]
+    for n, peer in enumerate(batch, start):
+        peer.connect(app, f"/ws/wishlists/{public_ids[n % len(public_ids)]}", "last_seq=1")
+    if not all(await asyncio.gather(*(peer.accepted for peer in batch))):
+        raise SystemExit("Часть сокетов отклонена: проверьте лимиты WS_*")
+    return batch
+
+
+async def run(args) -> int:
+    import httpx
+
+    from app.auth import AUTH_COOKIE_NAME, create_access_token
+    from app.main import create_app
+    from app.realtime import manager
+    from bench.seed import SeedConfig, seed
+
+    data = seed(SeedConfig(users=2, wishlists=args.wishlists, items_per_wishlist=1,
+                           contributions=0))
+    app = create_app()
+    await app.router.startup()
+    loop = asyncio.get_running_loop()
+    peers: List[Peer] = []
+    try:
+        # по подписчику на вишлист со снапшотом и по записи в каждый:
+        # в буфере повтора появляется событие seq=1
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for public_id, (wishlist_id, owner_id) in data.wishlists.items():
+                peer = Peer(loop)
+                peer.connect(app, f"/ws/wishlists/{public_id}", "")
+                if not await peer.accepted:
+                    raise SystemExit("Первый подписчик не подключился")
+                peers.append(peer)
+                token = create_access_token(data={"sub": str(owner_id)})
+                response = await client.post(
+                    f"/wishlists/{wishlist_id}/items",
+                    params={"include": "item"},
+                    json={"name": "bench", "price": "1"},
+                    headers={"Cookie": f"{AUTH_COOKIE_NAME}={token}"},
+                )
+                response.raise_for_status()
+        await wait_received(2 * len(peers), args.timeout)
+
+        public_ids = list(data.wishlists)
+        count = args.connections
+
+        tracemalloc.start()
+        before = memory()
+        probe = [Peer(loop) for _ in range(count)]
+        client_cost = memory()[0] - before[0]
+        del probe
+        print(f"Клиент (вычитается): {client_cost / count:,.0f} Б на сокет")
+
+        before = memory()
+        started = time.perf_counter()
+        for start in range(0, count, _BATCH):
+            peers.extend(await connect_batch(app, public_ids, start, min(start + _BATCH, count)))
+        connect_seconds = time.perf_counter() - started
+        # обработчики доходят до ожидания сообщений клиента
+        await asyncio.sleep(0.1)
+        after = memory()
+        print(f"Подключено {count:,} сокетов за {connect_seconds:.2f} с "
+              f"({connect_seconds / count * 1e6:.1f} мкс на сокет)")
+        print(f"Память на тихий сокет: {per_connection(before, after, count, client_cost)}")
+
+        # рассылка в один вишлист: все его подписчики. Первая запускает
+        # писателей тихих сокетов, вторая застаёт их ждущими (writer_idle)
+        subscribers = len(manager.active_connections[public_ids[0]])
+        for seq, label in ((2, "тихим"), (3, "активным")):
+            received = Peer.received
+            started = time.perf_counter()
+            await manager.broadcast(public_ids[0], {"type": "bench", "seq": seq, "from_seq": seq})
+            enqueue_seconds = time.perf_counter() - started
+            await wait_received(received + subscribers, args.timeout)
+            print(f"Рассылка {subscribers:,} {label} подписчикам: "
+                  f"раскладка {enqueue_seconds * 1000:.1f} мс, "
+                  f"доставка {(time.perf_counter() - started) * 1000:.1f} мс")
+
+        # обход heartbeat без молчащих и с ping всем сокетам
+        manager.heartbeat_interval, manager.heartbeat_timeout = 3600.0, 7200.0
+        started = time.perf_counter()
+        await manager.sweep()
+        print(f"Обход heartbeat без ping: {(time.perf_counter() - started) * 1000:.1f} мс")
+        manager.heartbeat_interval = 0.0
+        received = Peer.received
+        total = sum(len(c) for c in manager.active_connections.values())
+        started = time.perf_counter()
+        await manager.sweep()
+        sweep_seconds = time.perf_counter() - started
+        await wait_received(received + total, args.timeout)
+        print(f"Обход heartbeat с ping {total:,} сокетам: {sweep_seconds * 1000:.1f} мс, "
+              f"доставка {(time.perf_counter() - started) * 1000:.1f} мс")
+
+        # отключение всех: реестр должен опустеть, память — вернуться
+        started = time.perf_counter()
+        for peer in peers:
+            peer.disconnect()
+        for peer in peers:
+            await peer.task
+        disconnect_seconds = time.perf_counter() - started
+        # отменённые писатели завершаются на следующих итерациях loop
+        await asyncio.sleep(0.1)
+        left = sum(len(c) for c in manager.active_connections.values())
+        print(f"Отключено за {disconnect_seconds:.2f} с "
+              f"({disconnect_seconds / len(peers) * 1e6:.1f} мкс на сокет), в реестре: {left}")
+        del peer
+        peers.clear()
+        after = memory()
+        print(f"Осталось после отключения: {per_connection(before, after, count)}")
+        tracemalloc.stop()
+        return 1 if left else 0
+    finally:
+        for peer in peers:
+            peer.disconnect()
+        await app.router.shutdown()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Память на WebSocket-подключение")
+    parser.add_argument("--database-url", default=os.environ.get(
+        "BENCH_DATABASE_URL", "sqlite:///./bench.sqlite3"))
+    parser.add_argument("--connections", type=int, default=100_000)
+    parser.add_argument("--wishlists", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args(argv)
+
+    # настройки приложения читаются при импорте app.*; все сокеты идут
+    # с одного адреса, лимиты на клиента выключены, heartbeat вызывается вручную
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("WS_MAX_CONNECTIONS_PER_WISHLIST", str(args.connections))
+    os.environ.setdefault("WS_HEARTBEAT_INTERVAL_SECONDS", "0")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Продакшен-запуск: gunicorn с uvicorn-воркерами, приложение загружается
+в мастере один раз (preload_app) и достаётся воркерам через fork.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Из окружения:
+- WEB_CONCURRENCY — число воркеров (по умолчанию по числу ядер);
+- DB_CONNECTION_BUDGET — сколько соединений с Postgres может занять
+  весь инстанс; пулы воркеров считаются из него (database.pool_limits);
+- BIND (0.0.0.0:8000), GRACEFUL_TIMEOUT (30), KEEPALIVE (5).
+
+Движки БД создаются в воркере на startup, не в мастере. Плавный
+перезапуск: `kill -HUP <мастер>` поднимает новых воркеров и гасит
+старых по мере завершения запросов (код при этом не перечитывается —
+для выкладки нового кода USR2 и затем TERM старому мастеру). TERM
+останавливает воркеров, давая запросам GRACEFUL_TIMEOUT секунд.
+
+Время загрузки приложения в мастере пишется в журнал при старте,
+холодный старт каждого воркера — в журнал и в метрику
+process_cold_start_seconds.
+
+При нескольких воркерах нужны общие бэкенды. SNAPSHOT_CACHE_BACKEND=redis
+обязателен: с кэшем в памяти версии вишлистов у каждого воркера свои,
+и воркер, не видевший записи, отдавал бы 304 и старое тело под тем же
+ETag, — с ним запуск больше одного воркера прерывается. Без
+REALTIME_BROKER=postgres воркер не увидит событий соседей, без
+RATE_LIMIT_BACKEND=redis лимиты частоты считаются на каждый воркер
+отдельно — об этом только предупреждение в журнале.
+"""
+
+import multiprocessing
+import os
+import time
+
+_loading_started = time.monotonic()
+
+workers = int(os.environ.get("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+# воркеры читают число соседей из настроек, когда считают размер пула
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+from app.config import settings  # noqa: E402  (после WEB_CONCURRENCY)
+
+if workers > 1 and settings.SNAPSHOT_CACHE_BACKEND == "memory":
+    raise RuntimeError(
+        f"SNAPSHOT_CACHE_BACKEND=memory работает только с одним воркером, а их {workers}: "
+        "задайте SNAPSHOT_CACHE_BACKEND=redis и SNAPSHOT_CACHE_URL или WEB_CONCURRENCY=1"
+    )
+
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+preload_app = True
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("KEEPALIVE", 5))
+
+loglevel = "info"
+logconfig_dict = {
+    "loggers": {
+        "app": {"level": "INFO", "handlers": ["error_console"], "propagate": False},
+        "alembic": {"level": "WARNING"},
+    },
+}
+
+
+def when_ready(server) -> None:
+    from app.database import pool_limits
+
+    pool_size, max_overflow = pool_limits()
+    server.log.info(
+        "Приложение загружено за %.3f с; воркеров: %s, пул на воркер: %s + %s",
+        time.monotonic() - _loading_started,
+        workers,
+        pool_size,
+        max_overflow,
+    )
+    if workers > 1 and settings.REALTIME_BROKER == "memory":
+        server.log.warning(
+            "REALTIME_BROKER=memory: события не дойдут до подписчиков соседних воркеров"
+        )
+    if workers > 1 and settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_BACKEND == "memory":
+        server.log.warning(
+            "RATE_LIMIT_BACKEND=memory: у каждого воркера свои вёдра, предел в %d раз выше",
+            workers,
+        )
@@ -0,0 +1,47 @@
+"""
+Окружение Alembic: подключение из DATABASE_URL приложения, метаданные
+моделей — для --autogenerate.
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import Base, get_engine
+from app import models  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """SQL миграций без подключения к БД (alembic upgrade head --sql)."""
+    context.configure(
+        url=get_engine().url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    with get_engine().connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite не умеет ALTER COLUMN: изменения таблиц через копию
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
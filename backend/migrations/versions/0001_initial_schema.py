@@ -0,0 +1,110 @@
+"""initial schema
+
+Схема в том виде, в каком её создавал create_all при старте приложения
+(вместе с колонками агрегатов). Уже существующую базу переводят под
+миграции так:
+
+    python -m app.aggregates --legacy-columns   # недостающие колонки агрегатов
+    alembic stamp 0001
+    alembic upgrade head
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "wishlists",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("public_id", sa.String(length=64), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("event_date", sa.Date(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("event_seq", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_wishlists_id", "wishlists", ["id"])
+    op.create_index("ix_wishlists_public_id", "wishlists", ["public_id"], unique=True)
+
+    op.create_table(
+        "wishlist_items",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("wishlist_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("url", sa.String(length=1024), nullable=True),
+        sa.Column("price", sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column("image_url", sa.String(length=1024), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column(
+            "total_contributed",
+            sa.Numeric(precision=10, scale=2),
+            server_default="0",
+            nullable=False,
+        ),
+        sa.Column("contributors_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("reserved_by_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["reserved_by_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["wishlist_id"], ["wishlists.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_wishlist_items_id", "wishlist_items", ["id"])
+
+    op.create_table(
+        "contributions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["item_id"], ["wishlist_items.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_contributions_id", "contributions", ["id"])
+
+    op.create_table(
+        "reservations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["item_id"], ["wishlist_items.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("item_id", name="uq_reservation_item"),
+    )
+    op.create_index("ix_reservations_id", "reservations", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("reservations")
+    op.drop_table("contributions")
+    op.drop_table("wishlist_items")
+    op.drop_table("wishlists")
+    op.drop_table("users")
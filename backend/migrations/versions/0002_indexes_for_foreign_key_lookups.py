@@ -0,0 +1,48 @@
+"""indexes for foreign key lookups
+
+Индексы под горячие выборки по внешним ключам: подарки вишлиста,
+взносы зрителя в подарок, взносы и резервы пользователя, списки
+владельца по дате. Без них рендеринг и list_my_wishlists читают
+таблицы целиком.
+
+В Postgres индексы строятся CONCURRENTLY, вне транзакции миграции:
+запись в таблицы на время построения не блокируется.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_wishlist_items_wishlist_id", "wishlist_items", ["wishlist_id", "id"]),
+    ("ix_contributions_item_user", "contributions", ["item_id", "user_id"]),
+    ("ix_contributions_user_created", "contributions", ["user_id", "created_at"]),
+    ("ix_reservations_user_id", "reservations", ["user_id"]),
+    ("ix_wishlists_owner_created", "wishlists", ["owner_id", "created_at", "id"]),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,72 @@
+"""money in cents
+
+Деньги хранятся целыми копейками в BIGINT вместо NUMERIC(10, 2):
+wishlist_items.price -> price_cents,
+wishlist_items.total_contributed -> total_contributed_cents,
+contributions.amount -> amount_cents. Суммы больше 99 999 999.99
+больше не переполняют колонку.
+
+Колонки переписываются целиком: на больших таблицах миграцию
+стоит запускать в окно обслуживания.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# таблица -> [(рубли, копейки, server_default)]
+COLUMNS = {
+    "wishlist_items": [
+        ("price", "price_cents", None),
+        ("total_contributed", "total_contributed_cents", "0"),
+    ],
+    "contributions": [("amount", "amount_cents", None)],
+}
+
+
+def _move(table: str, columns, column_type, expression: str) -> None:
+    """
+    Переносит значения из колонок source в новые колонки target:
+    columns — [(source, target, server_default)], expression — SQL
+    с {} на месте source.
+    """
+    with op.batch_alter_table(table) as batch:
+        for _, target, _ in columns:
+            batch.add_column(sa.Column(target, column_type, nullable=True))
+    assignments = ", ".join(
+        f"{target} = {expression.format(source)}" for source, target, _ in columns
+    )
+    op.execute(f"UPDATE {table} SET {assignments}")
+    with op.batch_alter_table(table) as batch:
+        for source, target, server_default in columns:
+            batch.alter_column(
+                target,
+                existing_type=column_type,
+                nullable=False,
+                server_default=server_default,
+            )
+            batch.drop_column(source)
+
+
+def upgrade() -> None:
+    for table, columns in COLUMNS.items():
+        _move(table, columns, sa.BigInteger(), "ROUND({} * 100)")
+
+
+def downgrade() -> None:
+    for table, columns in COLUMNS.items():
+        _move(
+            table,
+            [(cents, units, default) for units, cents, default in columns],
+            sa.Numeric(precision=10, scale=2),
+            "{} / 100.0",
+        )
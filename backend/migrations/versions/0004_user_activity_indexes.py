@@ -0,0 +1,59 @@
+"""user activity indexes
+
+Лента /me/activity читает резервы и взносы пользователя по ключу
+(created_at, id) с LIMIT. Индексы по (user_id, created_at, id) отдают
+страницу диапазоном без сортировки; они заменяют ix_reservations_user_id
+и ix_contributions_user_created из 0002.
+
+Как и в 0002, в Postgres индексы строятся и удаляются CONCURRENTLY.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# (новый индекс, таблица, колонки, старый индекс, его колонки)
+INDEXES = (
+    (
+        "ix_contributions_user_activity",
+        "contributions",
+        ["user_id", "created_at", "id"],
+        "ix_contributions_user_created",
+        ["user_id", "created_at"],
+    ),
+    (
+        "ix_reservations_user_activity",
+        "reservations",
+        ["user_id", "created_at", "id"],
+        "ix_reservations_user_id",
+        ["user_id"],
+    ),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, old_name, _ in INDEXES:
+            op.create_index(
+                name, table, columns, if_not_exists=True, postgresql_concurrently=True
+            )
+            op.drop_index(
+                old_name, table_name=table, if_exists=True, postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, old_name, old_columns in reversed(INDEXES):
+            op.create_index(
+                old_name, table, old_columns, if_not_exists=True, postgresql_concurrently=True
+            )
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,55 @@
+"""
+Тесты бэкенда: `python -m pytest` из backend/ (pip install -r requirements-dev.txt).
+
+База — SQLite во временном каталоге, или Postgres из TEST_DATABASE_URL;
+схему создают миграции (bench.seed). Настройки приложения читаются при
+импорте app.*, поэтому окружение задаётся здесь, до импортов.
+
+pytest-asyncio не нужен: асинхронный сценарий запускается фикстурой run
+в своём event loop, после него пулы закрываются, чтобы соединения
+не переходили в loop следующего теста.
+"""
+
+import asyncio
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="wishlist-tests-")
+os.environ["DATABASE_URL"] = os.environ.get(
+    "TEST_DATABASE_URL", f"sqlite:///{_tmp}/test.sqlite3"
+)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("REPLICA_DATABASE_URL", None)
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+# все запросы тестов приходят с одного адреса
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["WS_HEARTBEAT_INTERVAL_SECONDS"] = "0"
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def run():
+    """run(coro) — выполнить корутину в новом event loop и закрыть пулы."""
+    from app.database import dispose_engines
+
+    def runner(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await dispose_engines()
+
+        return asyncio.run(main())
+
+    return runner
+
+
+@pytest.fixture
+def seed_db():
+    """seed_db(SeedConfig(...)) — пересоздать схему и засеять базу, вернуть SeedData."""
+    from app.database import get_engine
+    from bench.seed import seed
+
+    yield seed
+    get_engine().dispose()
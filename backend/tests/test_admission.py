@@ -0,0 +1,82 @@
+import asyncio
+
+import httpx
+
+from app.config import settings
+from bench.seed import SeedConfig
+
+
+class StalledReader:
+    """Клиент потокового ответа, который прочитал первую строку и перестал читать."""
+
+    def __init__(self, app, path: str, query: str) -> None:
+        self.status = None
+        self.started = asyncio.Event()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("test", 80),
+            "client": ("127.0.0.1", 0),
+            "root_path": "",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": [],
+        }
+        self.task = asyncio.create_task(app(scope, self.receive, self.send))
+        self._requested = False
+
+    async def receive(self) -> dict:
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(self, message: dict) -> None:
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message.get("body"):
+            self.started.set()
+            # буфер сокета полон: send не возвращается
+            await asyncio.Event().wait()
+
+
+def test_slow_stream_readers_do_not_starve_requests(seed_db, run, monkeypatch):
+    data = seed_db(SeedConfig(users=2, wishlists=1, items_per_wishlist=30, contributions=0))
+    public_id = next(iter(data.wishlists))
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_REQUESTS", 2)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT_SECONDS", 0.2)
+
+    async def scenario():
+        from app.main import create_app
+
+        app = create_app()
+        await app.router.startup()
+        readers = []
+        try:
+            # застрявших читателей больше, чем мест и очереди вместе
+            for _ in range(6):
+                reader = StalledReader(
+                    app, f"/wishlists/public/{public_id}/items/stream", "page_size=5"
+                )
+                readers.append(reader)
+                await asyncio.wait_for(reader.started.wait(), 5)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = [
+                    await client.get(f"/wishlists/public/{public_id}") for _ in range(3)
+                ]
+            return [reader.status for reader in readers], [r.status_code for r in responses]
+        finally:
+            for reader in readers:
+                reader.task.cancel()
+            await asyncio.gather(*(reader.task for reader in readers), return_exceptions=True)
+            await app.router.shutdown()
+
+    streams, requests = run(scenario())
+    assert streams == [200] * 6
+    assert requests == [200] * 3
@@ -0,0 +1,75 @@
+import httpx
+
+from app.config import settings
+from bench.seed import SeedConfig
+
+LIMIT = 1000
+CHUNK = b"x" * 500
+
+
+class Upload:
+    """Тело импорта кусками; считает, сколько из них сервер прочитал."""
+
+    def __init__(self, chunks: int) -> None:
+        self.chunks = chunks
+        self.read = 0
+
+    async def __aiter__(self):
+        for _ in range(self.chunks):
+            self.read += 1
+            yield CHUNK
+
+
+def test_bulk_import_checks_owner_and_size_before_reading(seed_db, run, monkeypatch):
+    data = seed_db(SeedConfig(users=2, wishlists=1, items_per_wishlist=1, contributions=0))
+    _, (wishlist_id, owner_id) = next(iter(data.wishlists.items()))
+    stranger_id = next(u for u in data.user_ids if u != owner_id)
+    monkeypatch.setattr(settings, "BULK_ITEMS_MAX_BYTES", LIMIT)
+    url = f"/wishlists/{wishlist_id}/items/bulk"
+
+    async def scenario():
+        from app.auth import AUTH_COOKIE_NAME, create_access_token
+        from app.main import create_app
+
+        def auth(user_id: int, **headers: str) -> dict:
+            token = create_access_token(data={"sub": str(user_id)})
+            return {"Cookie": f"{AUTH_COOKIE_NAME}={token}", **headers}
+
+        app = create_app()
+        await app.router.startup()
+        uploads = {
+            "stranger": Upload(10),
+            "declared": Upload(10),
+            "chunked": Upload(10),
+        }
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                csv = auth(owner_id, **{"Content-Type": "text/csv"})
+                statuses = {
+                    "stranger": await client.post(
+                        url, content=uploads["stranger"], headers=auth(stranger_id)
+                    ),
+                    "declared": await client.post(
+                        url,
+                        content=uploads["declared"],
+                        headers={**csv, "Content-Length": str(10 * len(CHUNK))},
+                    ),
+                    "chunked": await client.post(url, content=uploads["chunked"], headers=csv),
+                    "small": await client.post(
+                        url, content="name,url,price,image_url\nКот,,10.50,\n".encode(), headers=csv
+                    ),
+                }
+        finally:
+            await app.router.shutdown()
+        return {name: r.status_code for name, r in statuses.items()}, {
+            name: upload.read for name, upload in uploads.items()
+        }, statuses["small"].json()
+
+    statuses, read, small = run(scenario())
+    assert statuses == {"stranger": 403, "declared": 413, "chunked": 413, "small": 200}
+    assert read["stranger"] == 0
+    assert read["declared"] == 0
+    # 413 на третьем куске из десяти: 1500 байт > 1000
+    assert read["chunked"] == 3
+    assert [item["price_cents"] for item in small["created"]] == [1050]
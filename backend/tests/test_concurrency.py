@@ -0,0 +1,125 @@
+import asyncio
+
+import httpx
+from sqlalchemy import distinct, func, select
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Contribution, Reservation, Wishlist, WishlistItem
+from bench.seed import SeedConfig
+
+GUESTS = 8
+# на гостя: столько переключений резерва и столько же взносов по 1.00
+ROUNDS = 3
+
+
+def _state(item_id: int) -> dict:
+    """Подарок, его вишлист и таблицы взносов и резервов — прямо из базы."""
+    with SessionLocal() as db:
+        item = db.execute(
+            select(
+                WishlistItem.reserved_by_id,
+                WishlistItem.total_contributed_cents,
+                WishlistItem.contributors_count,
+                Wishlist.event_seq,
+            )
+            .join(Wishlist, Wishlist.id == WishlistItem.wishlist_id)
+            .where(WishlistItem.id == item_id)
+        ).one()
+        total, contributors = db.execute(
+            select(
+                func.coalesce(func.sum(Contribution.amount_cents), 0),
+                func.count(distinct(Contribution.user_id)),
+            ).where(Contribution.item_id == item_id)
+        ).one()
+        reservations = db.scalars(
+            select(Reservation.user_id).where(Reservation.item_id == item_id)
+        ).all()
+    return {
+        "reserved_by_id": item.reserved_by_id,
+        "total_contributed_cents": item.total_contributed_cents,
+        "contributors_count": item.contributors_count,
+        "event_seq": item.event_seq,
+        "contributions_sum": total,
+        "contributors": contributors,
+        "reservations": sorted(reservations),
+    }
+
+
+def test_concurrent_toggles_and_contributions_keep_item_consistent(seed_db, run, monkeypatch):
+    data = seed_db(
+        SeedConfig(users=GUESTS + 1, wishlists=1, items_per_wishlist=1,
+                   contributions=0, reserved_share=0)
+    )
+    item_id, owner_id = next(iter(data.item_owner.items()))
+    guests = [user_id for user_id in data.user_ids if user_id != owner_id]
+    # все запросы сразу: очередь приёма не должна отвечать 503
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT_SECONDS", 30.0)
+    before = _state(item_id)
+
+    async def scenario():
+        from app.auth import AUTH_COOKIE_NAME, create_access_token
+        from app.main import create_app
+
+        app = create_app()
+        cookies = {
+            user_id: f"{AUTH_COOKIE_NAME}={create_access_token(data={'sub': str(user_id)})}"
+            for user_id in guests
+        }
+
+        async def toggle(client, user_id):
+            response = await client.post(
+                f"/wishlists/items/{item_id}/reserve", headers={"Cookie": cookies[user_id]}
+            )
+            return "toggle", user_id, response.status_code
+
+        async def contribute(client, user_id):
+            response = await client.post(
+                f"/wishlists/items/{item_id}/contribute",
+                json={"amount": "1.00"},
+                headers={"Cookie": cookies[user_id]},
+            )
+            return "contribute", user_id, response.status_code
+
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(
+                    *(
+                        call(client, user_id)
+                        for _ in range(ROUNDS)
+                        for user_id in guests
+                        for call in (toggle, contribute)
+                    )
+                )
+        finally:
+            await app.router.shutdown()
+
+    results = run(scenario())
+    after = _state(item_id)
+
+    # 400 — подарок в этот момент зарезервирован другим: законный исход гонки
+    assert {status for _, _, status in results} <= {200, 400}
+    toggled = {user_id: 0 for user_id in guests}
+    contributors = set()
+    for kind, user_id, status in results:
+        if status != 200:
+            continue
+        if kind == "toggle":
+            toggled[user_id] += 1
+        else:
+            contributors.add(user_id)
+    contributed = sum(
+        1 for kind, _, status in results if kind == "contribute" and status == 200
+    )
+    # резерв у того, кто переключил нечётное число раз, и такой не больше одного
+    holders = sorted(user_id for user_id, count in toggled.items() if count % 2)
+
+    assert contributed == ROUNDS * GUESTS
+    assert len(holders) <= 1
+    assert after["reserved_by_id"] == (holders[0] if holders else None)
+    assert after["reservations"] == holders
+    assert after["total_contributed_cents"] == after["contributions_sum"] == contributed * 100
+    assert after["contributors_count"] == after["contributors"] == len(contributors)
+    assert after["event_seq"] == before["event_seq"] + sum(toggled.values()) + contributed
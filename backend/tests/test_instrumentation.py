@@ -0,0 +1,47 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app import metrics
+from app.instrumentation import (
+    DB_POOL_TIMEOUTS,
+    DB_POOL_WAIT_SECONDS,
+    TimedQueuePool,
+    instrument_engine,
+)
+
+
+def _waits(engine: str) -> int:
+    counts = DB_POOL_WAIT_SECONDS._values.get((engine,))
+    return counts[2] if counts else 0
+
+
+def test_reinstrumented_engine_replaces_its_pool_collector():
+    from sqlalchemy import create_engine
+
+    before = len(metrics.REGISTRY._collectors)
+    for _ in range(3):
+        instrument_engine(create_engine("sqlite://"), "test-reinstrumented")
+    assert len(metrics.REGISTRY._collectors) == before + 1
+
+
+def test_timed_pool_records_waits_and_timeouts():
+    pool = TimedQueuePool(
+        lambda: sqlite3.connect(":memory:"),
+        pool_size=1,
+        max_overflow=0,
+        timeout=0.05,
+        logging_name="test-timed",
+    )
+    waits = _waits("test-timed")
+    held = pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    held.close()
+    # recreate() — так пул пересоздаётся при engine.dispose(): метка сохраняется
+    pool = pool.recreate()
+    pool.connect().close()
+
+    assert _waits("test-timed") == waits + 3
+    assert DB_POOL_TIMEOUTS.value(engine="test-timed") == 1
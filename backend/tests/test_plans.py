@@ -0,0 +1,27 @@
+import pytest
+
+from bench.plans import analyze, checks, explain, missing_indexes
+from bench.seed import SeedConfig
+
+CHECKS = {name: (build, indexes) for name, build, indexes in checks()}
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    from app.database import get_engine
+    from bench.seed import seed
+
+    data = seed(SeedConfig(wishlists=20, items_per_wishlist=100))
+    analyze(get_engine())
+    yield data
+    get_engine().dispose()
+
+
+@pytest.mark.parametrize("name", list(CHECKS))
+def test_hot_query_uses_its_indexes(seeded, name):
+    from app.database import get_engine
+
+    build, indexes = CHECKS[name]
+    with get_engine().connect() as conn:
+        lines = explain(conn, build(seeded))
+    assert missing_indexes(lines, indexes) == [], "\n".join(lines)
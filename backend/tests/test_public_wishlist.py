@@ -0,0 +1,31 @@
+import httpx
+
+from bench.seed import SeedConfig
+
+
+def test_if_none_match_star_needs_an_existing_wishlist(seed_db, run):
+    data = seed_db(SeedConfig(users=2, wishlists=1, items_per_wishlist=2, contributions=0))
+    public_id = next(iter(data.wishlists))
+
+    async def scenario():
+        from app.main import create_app
+
+        app = create_app()
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                star = {"If-None-Match": "*"}
+                missing = await client.get("/wishlists/public/no-such-list", headers=star)
+                fresh = await client.get(f"/wishlists/public/{public_id}")
+                etag = {"If-None-Match": fresh.headers["ETag"]}
+                return [
+                    missing.status_code,
+                    fresh.status_code,
+                    (await client.get(f"/wishlists/public/{public_id}", headers=etag)).status_code,
+                    (await client.get(f"/wishlists/public/{public_id}", headers=star)).status_code,
+                ]
+        finally:
+            await app.router.shutdown()
+
+    assert run(scenario()) == [404, 200, 304, 304]
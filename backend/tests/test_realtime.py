@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+from app import main
+from app.limits import ws_limiter
+from app.realtime import WS_CLOSE_SEND_FAILED, WishlistConnectionManager, manager
+from bench.seed import SeedConfig
+from bench.ws import ASGIWebSocket
+
+
+def test_handler_error_leaves_no_connection_behind(seed_db, run, monkeypatch):
+    data = seed_db(SeedConfig(users=2, wishlists=1, items_per_wishlist=3, contributions=0))
+    public_id = next(iter(data.wishlists))
+
+    async def scenario():
+        app = main.create_app()
+        await app.router.startup()
+        try:
+            ws = await ASGIWebSocket(app, f"/ws/wishlists/{public_id}").connect()
+            assert json.loads(await ws.receive_text())["type"] == "wishlist_snapshot"
+            assert len(manager.active_connections[public_id]) == 1
+
+            async def broken_snapshot(public_id):
+                raise RuntimeError("БД недоступна")
+
+            # resync падает не с WebSocketDisconnect
+            monkeypatch.setattr(main, "_snapshot_message", broken_snapshot)
+            await ws.send_text(json.dumps({"type": "resync"}))
+            with pytest.raises(RuntimeError):
+                await asyncio.wait_for(ws._task, 5)
+            return (
+                public_id in manager.active_connections,
+                ws_limiter._by_wishlist.get(public_id, 0),
+            )
+        finally:
+            await app.router.shutdown()
+
+    registered, held = run(scenario())
+    assert not registered
+    assert held == 0
+
+
+class FailingSocket:
+    def __init__(self) -> None:
+        self.closed_with = None
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        raise ConnectionResetError
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+
+
+def test_failed_send_closes_socket():
+    async def scenario():
+        realtime = WishlistConnectionManager()
+        await realtime.start()
+        websocket = FailingSocket()
+        await realtime.connect("w", websocket)
+        await realtime.broadcast("w", {"type": "noop", "seq": 1})
+        await asyncio.sleep(0.01)
+        await realtime.stop()
+        return "w" in realtime.active_connections, websocket.closed_with
+
+    registered, closed_with = asyncio.run(scenario())
+    assert not registered
+    assert closed_with == WS_CLOSE_SEND_FAILED
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal, init_engines
+from app.instrumentation import track_queries
+from app.models import Contribution
+from app.rendering import build_wishlist_query, item_public, render_wishlist
+from app.serialization import dumps
+from bench.seed import SeedConfig
+
+ITEMS = 200
+CONTRIBUTIONS = 5000
+
+
+@pytest.fixture
+def big_wishlist(seed_db):
+    data = seed_db(
+        SeedConfig(wishlists=1, items_per_wishlist=ITEMS, contributions=CONTRIBUTIONS)
+    )
+    return next(iter(data.wishlists))
+
+
+async def _viewer(db) -> int:
+    """Пользователь с наибольшим числом взносов: его строки тоже присоединяются."""
+    return await db.scalar(
+        select(Contribution.user_id)
+        .group_by(Contribution.user_id)
+        .order_by(func.count().desc())
+        .limit(1)
+    )
+
+
+@pytest.mark.parametrize("as_viewer", [False, True], ids=["guest", "viewer"])
+def test_render_is_one_query_with_a_row_per_item(big_wishlist, run, as_viewer):
+    async def scenario():
+        init_engines()
+        async with AsyncSessionLocal() as db:
+            viewer_id = await _viewer(db) if as_viewer else None
+            rows = (
+                await db.execute(build_wishlist_query(public_id=big_wishlist, viewer_id=viewer_id))
+            ).all()
+            with track_queries() as stats:
+                public = await render_wishlist(db, public_id=big_wishlist, viewer_id=viewer_id)
+            return len(rows), stats.queries, len(public.items)
+
+    rows, queries, items = run(scenario())
+    assert rows == ITEMS
+    assert queries == 1
+    assert items == ITEMS
+
+
+def test_render_viewer_sums_match_contributions(big_wishlist, run):
+    async def scenario():
+        init_engines()
+        async with AsyncSessionLocal() as db:
+            viewer_id = await _viewer(db)
+            public = await render_wishlist(db, public_id=big_wishlist, viewer_id=viewer_id)
+            expected = await db.scalar(
+                select(func.sum(Contribution.amount_cents)).where(
+                    Contribution.user_id == viewer_id
+                )
+            )
+            return sum(item.your_contribution_cents for item in public.items), expected
+
+    rendered, expected = run(scenario())
+    assert rendered == expected
+
+
+def test_money_is_sent_in_exact_cents():
+    # 2**53 + 1 копейка: в float рублей последняя копейка теряется
+    cents = 2**53 + 1
+    row = SimpleNamespace(
+        id=1, name="Дом", url=None, image_url=None, reserved_by_id=None,
+        price_cents=cents, total_contributed_cents=cents,
+    )
+    item = orjson.loads(dumps(item_public(row, viewer_id=7, your_contribution_cents=cents)))
+    assert item["price_cents"] == item["total_contributed_cents"] == cents
+    assert item["your_contribution_cents"] == cents